@@ -45,8 +45,11 @@ MCP Approval Flow:
 Performance Optimizations:
 --------------------------
 - Clients are initialized once at startup and reused for all requests
+- A shared HTTP/2 httpx connection pool keeps TLS sessions alive between turns
+- Responses are streamed so text appears as soon as the first tokens arrive
 - Conversation is created once and maintained throughout the session
 - Agent name is cached to avoid repeated environment lookups
+- The Application Insights connection string is cached on disk for 24h
 
 Required Environment Variables:
 -------------------------------
@@ -56,27 +59,97 @@ Required Environment Variables:
 Optional Environment Variables (Tracing):
 -----------------------------------------
 - OTEL_INSTRUMENTATION_GENAI_CAPTURE_MESSAGE_CONTENT: Set to "true" to trace message content
+- OTEL_BSP_SCHEDULE_DELAY / OTEL_BSP_MAX_QUEUE_SIZE / OTEL_BSP_MAX_EXPORT_BATCH_SIZE:
+  Span batching (defaults: 500 ms / 4096 / 512)
+- OTEL_TRACES_SAMPLER_ARG: Fraction of SDK-internal root traces to keep (default: 0.1).
+  "agent_chat" turns and everything under them are always recorded.
 
 Authentication:
 ---------------
-Uses DefaultAzureCredential which supports multiple authentication methods.
+Uses environment variables (service principal) or Azure CLI credentials (az login).
+Set FOUNDRY_CREDENTIAL_CHAIN=managed for managed identity only, or
+FOUNDRY_CREDENTIAL_CHAIN=default to use the full DefaultAzureCredential chain
+(managed identity, VS Code, etc.).
 
 Usage:
 ------
 Run the script and type your questions. Press Ctrl+C to exit.
 Type 'new' to start a new conversation.
+Type 'batch' to enter several questions that are answered in a single request.
 """
 
 import os
+import re
 import sys
+import json
+import atexit
+import operator
+import tempfile
+import time
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
 from dotenv import load_dotenv
 
+# Line editing and history for the input() prompts (stdlib on Linux/macOS;
+# on Windows, installing pyreadline3 provides the same module)
+try:
+    import readline  # noqa: F401
+except ImportError:
+    readline = None
+
 # Load environment variables from project root FIRST (before tracing setup)
 # Navigate up from clients/project/ to find .env
 project_root = Path(__file__).resolve().parent.parent.parent
 load_dotenv(project_root / ".env")
 
+# =============================================================================
+# CONFIGURATION (Read from the environment once at startup)
+# =============================================================================
+
+# Fraction of SDK-internal root traces kept when OTEL_TRACES_SAMPLER_ARG is unset or invalid
+DEFAULT_TRACE_SAMPLE_RATIO = 0.1
+
+
+def read_trace_sample_ratio():
+    """Read OTEL_TRACES_SAMPLER_ARG, warning and using the default if it is not a 0-1 fraction."""
+    value = os.environ.get("OTEL_TRACES_SAMPLER_ARG")
+    if value is None:
+        return DEFAULT_TRACE_SAMPLE_RATIO
+    try:
+        ratio = float(value)
+    except ValueError:
+        ratio = None
+    if ratio is None or not 0.0 <= ratio <= 1.0:
+        print(f"Warning: OTEL_TRACES_SAMPLER_ARG='{value}' is not a number between 0 and 1, "
+              f"using {DEFAULT_TRACE_SAMPLE_RATIO}")
+        return DEFAULT_TRACE_SAMPLE_RATIO
+    return ratio
+
+
+@dataclass(frozen=True, slots=True)
+class Config:
+    """Settings read from the environment once at startup and reused everywhere."""
+    endpoint: str
+    agent_name: str
+    credential_chain: str
+    trace_sample_ratio: float
+    
+    @classmethod
+    def from_env(cls):
+        """Build the config from environment variables (raises KeyError if a required one is missing)."""
+        return cls(
+            endpoint=os.environ["AZURE_AI_FOUNDRY_PROJECT_ENDPOINT"],
+            agent_name=os.environ["AZURE_AI_FOUNDRY_AGENT_NAME"],
+            credential_chain=os.environ.get("FOUNDRY_CREDENTIAL_CHAIN", "cli").strip().lower(),
+            # Fraction of SDK-internal root traces to export; agent_chat turns are
+            # always kept, along with every span created under them (see build_sampler)
+            trace_sample_ratio=read_trace_sample_ratio(),
+        )
+
+
+CFG = Config.from_env()
+
 # =============================================================================
 # TRACING CONTENT RECORDING - Must be set BEFORE importing Azure SDK
 # =============================================================================
@@ -85,29 +158,71 @@ load_dotenv(project_root / ".env")
 # See: https://learn.microsoft.com/azure/ai-foundry/how-to/develop/trace-agents-sdk
 os.environ["AZURE_TRACING_GEN_AI_CONTENT_RECORDING_ENABLED"] = "true"
 
-from azure.identity import DefaultAzureCredential
+import httpx
+from openai import DefaultHttpxClient
+from azure.identity import (
+    AzureCliCredential,
+    ChainedTokenCredential,
+    DefaultAzureCredential,
+    EnvironmentCredential,
+    ManagedIdentityCredential,
+)
 from azure.ai.projects import AIProjectClient
 # Tracing imports for Azure Monitor / Application Insights
 from azure.core.settings import settings
 settings.tracing_implementation = "opentelemetry"  # Must be set before other tracing imports
 
 from opentelemetry import trace
-from azure.monitor.opentelemetry import configure_azure_monitor
-from azure.ai.projects.telemetry import AIProjectInstrumentor
+# azure.monitor.opentelemetry and azure.ai.projects.telemetry are imported in
+# setup_tracing(), only once Application Insights is known to be configured.
+# They pull in the full OpenTelemetry SDK and exporters and dominate startup.
 
 # =============================================================================
 # INITIALIZATION (Done once at startup for optimal performance)
 # =============================================================================
 
+@lru_cache(maxsize=None)
+def create_credential():
+    """
+    Return the Azure credential used for authentication, created once per process.
+    
+    Every client built in this process shares the one credential (and its
+    token cache) instead of probing the credential chain again.
+    
+    FOUNDRY_CREDENTIAL_CHAIN selects the credential:
+      - "cli" (default): environment variables (service principal) + Azure CLI
+        login, which skips probing managed identity, VS Code, etc. on every start
+      - "managed": managed identity only (AZURE_CLIENT_ID selects a
+        user-assigned identity)
+      - "default": the full DefaultAzureCredential chain
+    Any other value falls back to "cli" with a warning.
+    """
+    if CFG.credential_chain == "default":
+        return DefaultAzureCredential()
+    if CFG.credential_chain == "managed":
+        return ManagedIdentityCredential(client_id=os.environ.get("AZURE_CLIENT_ID"))
+    if CFG.credential_chain != "cli":
+        print(f"Warning: unknown FOUNDRY_CREDENTIAL_CHAIN={CFG.credential_chain!r} (expected cli, managed or default); using cli")
+    return ChainedTokenCredential(EnvironmentCredential(), AzureCliCredential())
+
+
+@lru_cache(maxsize=4)
+def get_project_client(endpoint):
+    """
+    Return the AIProjectClient for an endpoint, created once per process.
+    
+    Repeated calls (e.g. re-running cells in a notebook) reuse the same client
+    and its credential instead of building and authenticating a new one.
+    """
+    return AIProjectClient(endpoint=endpoint, credential=create_credential())
+
+
 print("Initializing Azure AI Foundry connection...")
-print(f"Endpoint: {os.environ['AZURE_AI_FOUNDRY_PROJECT_ENDPOINT']}")
+print(f"Endpoint: {CFG.endpoint}")
 
 # Initialize the AI Project Client with Azure credentials (one-time setup)
 # This connection is reused for all subsequent requests
-project_client = AIProjectClient(
-    endpoint=os.environ["AZURE_AI_FOUNDRY_PROJECT_ENDPOINT"],
-    credential=DefaultAzureCredential(),
-)
+project_client = get_project_client(CFG.endpoint)
 
 # =============================================================================
 # TRACING SETUP (Azure Monitor / Application Insights)
@@ -119,36 +234,282 @@ project_client = AIProjectClient(
 # your Foundry project configuration. Make sure Application Insights is enabled
 # in your Foundry project settings.
 #
+# The connection string is cached on disk (per project endpoint, 24h TTL) so
+# restarting the script does not repeat the control-plane lookup. Delete the
+# cache file to force a refresh.
+#
 # IMPORTANT: Instrumentation must be enabled BEFORE getting the OpenAI client
 # =============================================================================
 
-try:
-    app_insights_conn_str = project_client.telemetry.get_application_insights_connection_string()
-    if app_insights_conn_str:
-        configure_azure_monitor(connection_string=app_insights_conn_str)
-        # Enable AI Projects instrumentation BEFORE getting OpenAI client
-        # This instruments the client to capture full request/response data
-        AIProjectInstrumentor().instrument()
-        print("Tracing enabled: Azure Application Insights + AI Projects instrumentation")
-        print(f"Content capture: {os.environ.get('AZURE_TRACING_GEN_AI_CONTENT_RECORDING_ENABLED', 'false')}")
-    else:
-        print("Tracing: Application Insights not configured in Foundry project")
-except Exception as e:
-    print(f"Tracing: Could not configure ({e})")
+APP_INSIGHTS_CACHE_FILE = (
+    Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "foundry" / "appinsights.json"
+)
+APP_INSIGHTS_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+
+def get_app_insights_connection_string(endpoint):
+    """
+    Get the Application Insights connection string for a project endpoint.
+    
+    Returns the cached value if it is younger than the TTL, otherwise fetches
+    it from the Foundry project and refreshes the cache.
+    """
+    try:
+        cache = json.loads(APP_INSIGHTS_CACHE_FILE.read_text())
+    except (OSError, ValueError):
+        cache = {}
+    
+    # A malformed entry (hand-edited or from an older version) is a cache miss
+    entry = cache.get(endpoint) if isinstance(cache, dict) else None
+    if isinstance(entry, dict):
+        fetched_at = entry.get("fetched_at")
+        cached_conn_str = entry.get("connection_string")
+        if (
+            isinstance(fetched_at, (int, float))
+            and isinstance(cached_conn_str, str)
+            and time.time() - fetched_at < APP_INSIGHTS_CACHE_TTL_SECONDS
+        ):
+            return cached_conn_str
+    
+    conn_str = project_client.telemetry.get_application_insights_connection_string()
+    if conn_str:
+        if not isinstance(cache, dict):
+            cache = {}
+        cache[endpoint] = {"connection_string": conn_str, "fetched_at": time.time()}
+        try:
+            APP_INSIGHTS_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            # Create the file owner-only from the start and swap it in atomically,
+            # so the connection string is never readable by other users
+            fd, tmp_path = tempfile.mkstemp(dir=APP_INSIGHTS_CACHE_FILE.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(cache, f)
+                os.replace(tmp_path, APP_INSIGHTS_CACHE_FILE)
+            except OSError:
+                os.unlink(tmp_path)
+                raise
+        except OSError:
+            pass  # Caching is best-effort
+    return conn_str
+
+
+# Tune the BatchSpanProcessor attached to the Azure Monitor exporter. Spans are
+# exported in the background every 500 ms in batches, so only a small tail is
+# left for force_flush() on exit. These are the standard OTEL_BSP_* settings
+# and can still be overridden from the environment.
+os.environ.setdefault("OTEL_BSP_MAX_QUEUE_SIZE", "4096")
+os.environ.setdefault("OTEL_BSP_SCHEDULE_DELAY", "500")
+os.environ.setdefault("OTEL_BSP_MAX_EXPORT_BATCH_SIZE", "512")
+
+
+def build_sampler(ratio):
+    """
+    Build the trace sampler used by the tracer provider.
+    
+    Root spans named "agent_chat" are always sampled, other root spans are
+    sampled by trace id at the given ratio, and child spans follow their
+    parent's decision.
+    
+    Args:
+        ratio: Fraction (0.0 - 1.0) of non-chat root traces to keep
+    
+    Returns:
+        An OpenTelemetry Sampler
+    """
+    from opentelemetry.sdk.trace.sampling import ALWAYS_ON, ParentBased, Sampler, TraceIdRatioBased
+    
+    class AgentChatSampler(Sampler):
+        def __init__(self):
+            self._ratio_sampler = TraceIdRatioBased(ratio)
+        
+        def should_sample(self, parent_context, trace_id, name, *args, **kwargs):
+            sampler = ALWAYS_ON if name == "agent_chat" else self._ratio_sampler
+            return sampler.should_sample(parent_context, trace_id, name, *args, **kwargs)
+        
+        def get_description(self):
+            return f"AgentChatSampler{{agent_chat=1.0, other={ratio}}}"
+    
+    return ParentBased(root=AgentChatSampler())
+
+
+def setup_tracing():
+    """Configure Azure Monitor tracing and AI Projects instrumentation (once at startup)."""
+    try:
+        app_insights_conn_str = get_app_insights_connection_string(CFG.endpoint)
+        if app_insights_conn_str:
+            # Heavy telemetry imports are deferred until tracing is actually enabled
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+            from azure.monitor.opentelemetry import configure_azure_monitor
+            from azure.monitor.opentelemetry.exporter import AzureMonitorTraceExporter
+            from azure.ai.projects.telemetry import AIProjectInstrumentor
+            
+            # The tracer provider is built here so its sampler can keep chat
+            # turns while down-sampling SDK internals
+            tracer_provider = TracerProvider(sampler=build_sampler(CFG.trace_sample_ratio))
+            tracer_provider.add_span_processor(
+                BatchSpanProcessor(AzureMonitorTraceExporter(connection_string=app_insights_conn_str))
+            )
+            trace.set_tracer_provider(tracer_provider)
+            # configure_azure_monitor still sets up log and metric export and the
+            # library auto-instrumentation; only its tracer provider is skipped,
+            # so spans from the instrumented libraries go through the one above
+            configure_azure_monitor(connection_string=app_insights_conn_str, disable_tracing=True)
+            # Enable AI Projects instrumentation BEFORE getting OpenAI client
+            # This instruments the client to capture full request/response data
+            AIProjectInstrumentor().instrument()
+            print("Tracing enabled: Azure Application Insights + AI Projects instrumentation")
+            print(f"Sampling: agent_chat=100%, SDK internals={CFG.trace_sample_ratio:.0%}")
+            print(f"Content capture: {os.environ.get('AZURE_TRACING_GEN_AI_CONTENT_RECORDING_ENABLED', 'false')}")
+        else:
+            print("Tracing: Application Insights not configured in Foundry project")
+    except Exception as e:
+        print(f"Tracing: Could not configure ({e})")
+
+
+setup_tracing()
 
 # Get a tracer for creating custom spans
 tracer = trace.get_tracer(__name__)
 
-# Get the agent name from environment and cache it
-agent_name = os.environ["AZURE_AI_FOUNDRY_AGENT_NAME"]
+# Cache the agent name used in spans and request bodies
+agent_name = CFG.agent_name
 print(f"Agent: {agent_name}")
 
+# Agent reference sent with every request (built once, reused for all calls)
+AGENT_EXTRA_BODY = {"agent": {"name": agent_name, "type": "agent_reference"}}
+
+# Shared HTTP client for all Responses API calls
+# A larger keep-alive pool with a long expiry lets follow-up turns and MCP
+# approval continuations reuse the existing TLS connection instead of
+# paying a fresh TCP/TLS handshake. Retries cover transient connect errors.
+# HTTP/2 (negotiated via ALPN, falls back to HTTP/1.1) multiplexes streamed
+# responses, conversation calls and approval continuations on one connection.
+http_client = DefaultHttpxClient(
+    transport=httpx.HTTPTransport(
+        http2=True,
+        retries=3,
+        limits=httpx.Limits(
+            max_keepalive_connections=32,
+            max_connections=64,
+            keepalive_expiry=120,
+        ),
+    ),
+)
+# Close pooled connections cleanly on exit
+atexit.register(http_client.close)
+
+
+@lru_cache(maxsize=4)
+def get_openai_client(endpoint):
+    """Return the OpenAI-compatible client for an endpoint, sharing the pooled http_client."""
+    return get_project_client(endpoint).get_openai_client(http_client=http_client)
+
+
 # Get the OpenAI-compatible client AFTER instrumentation is enabled
 # This ensures all API calls are traced properly
-openai_client = project_client.get_openai_client()
+openai_client = get_openai_client(CFG.endpoint)
+
+
+# Marker used to split batched answers, e.g. "[Q2]:"
+BATCH_ANSWER_MARKER = re.compile(r"\[Q(\d+)\]:?")
+
 
+# Stream events that carry the final response object
+FINAL_RESPONSE_EVENTS = ("response.completed", "response.incomplete", "response.failed")
 
-def process_response_with_mcp_approval(response):
+# Streamed text is flushed to the terminal at most this often / after this
+# many characters, instead of once per token
+STDOUT_FLUSH_INTERVAL_SECONDS = 0.03
+STDOUT_FLUSH_CHARS = 256
+
+# stdout methods bound once for the per-token streaming path
+_write = sys.stdout.write
+_flush = sys.stdout.flush
+
+
+def stream_response(echo=True, **request):
+    """
+    Create a streamed response and return the final response object.
+    
+    Text deltas are printed as they arrive so the user sees the first
+    tokens immediately instead of waiting for the full generation.
+    
+    Args:
+        echo: Print streamed text to the console
+        **request: Arguments for openai_client.responses.create()
+    
+    Returns:
+        The final response (same shape as a non-streaming responses.create())
+    """
+    stream = openai_client.responses.create(stream=True, **request)
+    
+    final_response = None
+    is_streaming_text = False
+    unflushed_chars = 0  # Text written to stdout since the last flush
+    last_flush = time.monotonic()
+    
+    try:
+        for event in stream:
+            event_type = event.type
+            
+            if event_type == "response.output_text.delta":
+                if echo:
+                    if not is_streaming_text:
+                        # First text chunk - print the "Assistant:" header
+                        print("\nAssistant: ", end="", flush=True)
+                        is_streaming_text = True
+                    delta = event.delta
+                    _write(delta)
+                    
+                    # Batch terminal flushes: one write() syscall per burst of tokens
+                    unflushed_chars += len(delta)
+                    now = time.monotonic()
+                    if unflushed_chars > STDOUT_FLUSH_CHARS or now - last_flush > STDOUT_FLUSH_INTERVAL_SECONDS:
+                        _flush()
+                        unflushed_chars = 0
+                        last_flush = now
+            
+            elif event_type in FINAL_RESPONSE_EVENTS:
+                final_response = event.response
+            
+            elif event_type == "error":
+                raise RuntimeError(f"Stream error: {getattr(event, 'message', event)}")
+    finally:
+        # Drain any buffered text, including when the stream fails mid-way
+        if is_streaming_text:
+            print("\n", flush=True)  # New line after streaming completes
+    
+    if final_response is None:
+        raise RuntimeError("Stream ended without a final response")
+    
+    return final_response
+
+
+# Bound once; attrgetter does the attribute lookup in C on every output item
+_get_type = operator.attrgetter("type")
+
+
+def _collect_mcp_approvals(response, approved_ids=frozenset()):
+    """
+    Return the mcp_approval_request items from a response's output in one pass.
+    
+    Requests whose id is already in approved_ids are skipped, so a request the
+    server redelivers is not approved again.
+    """
+    output = getattr(response, 'output', None) or []
+    try:
+        requests = [item for item in output if _get_type(item) == "mcp_approval_request"]
+    except AttributeError:
+        # An output item without a type (unexpected payload) - fall back to a tolerant scan
+        requests = [
+            item for item in output
+            if getattr(item, 'type', None) == "mcp_approval_request"
+        ]
+    return [req for req in requests if req.id not in approved_ids]
+
+
+def process_response_with_mcp_approval(response, echo=True):
     """
     Process a response and automatically approve any pending MCP tool calls.
     
@@ -158,9 +519,11 @@ def process_response_with_mcp_approval(response):
     
     Args:
         response: The response object from openai_client.responses.create()
+        echo: Print the streamed text of approval continuations
     
     Returns:
-        The final response after all MCP approvals have been processed.
+        tuple: (response, had_mcp) - the final response after all MCP approvals
+        have been processed, and whether any approval was sent.
     
     MCP Approval Items:
         - mcp_approval_request: Sent by agent when it needs to call an MCP tool
@@ -169,20 +532,21 @@ def process_response_with_mcp_approval(response):
     Note:
         This implementation auto-approves all MCP requests. In production,
         you may want to add validation or user confirmation for sensitive operations.
-    """
-    # Check if there are pending MCP approval requests
-    while response.status == "incomplete" or (hasattr(response, 'output') and any(
-        item.type == "mcp_approval_request" for item in response.output if hasattr(item, 'type')
-    )):
-        # Find MCP approval requests in the output
-        approval_requests = [
-            item for item in response.output 
-            if hasattr(item, 'type') and item.type == "mcp_approval_request"
-        ]
         
-        if not approval_requests:
-            break
-            
+        All approvals for a response are sent together in ONE continuation.
+        Every approval must reference the response that requested it via
+        previous_response_id, and each continuation produces the next response
+        in the chain, so there are no independent chains to run concurrently.
+        Fanning approvals out over parallel requests would fork the chain.
+    """
+    # Track approved request ids so a redelivered request is never approved twice
+    # (also stops the loop if the server keeps echoing the same request)
+    approved_ids = set()
+    
+    # Keep approving while the latest response still has new pending MCP requests
+    approval_requests = _collect_mcp_approvals(response, approved_ids)
+    
+    while approval_requests:
         # Approve all pending MCP requests
         approvals = []
         for req in approval_requests:
@@ -192,18 +556,21 @@ def process_response_with_mcp_approval(response):
                 "approve": True,
                 "approval_request_id": req.id
             })
+        approved_ids.update(req.id for req in approval_requests)
         
         # Continue the response with approvals
         # Note: MCP approval continuations MUST use previous_response_id to link
         # the approval back to the specific response that requested it.
         # These will show as "--" for Conversation ID in traces, which is expected.
-        response = openai_client.responses.create(
-            extra_body={"agent": {"name": agent_name, "type": "agent_reference"}},
+        response = stream_response(
+            echo=echo,
+            extra_body=AGENT_EXTRA_BODY,
             input=approvals,
             previous_response_id=response.id
         )
+        approval_requests = _collect_mcp_approvals(response, approved_ids)
     
-    return response
+    return response, bool(approved_ids)
 
 
 # =============================================================================
@@ -217,6 +584,144 @@ def create_conversation():
     return conversation
 
 
+def send_message(user_input, conversation, last_response, echo=True):
+    """
+    Send a user message to the agent and return the final response.
+    
+    The reply is streamed to the console as it is generated.
+    
+    Args:
+        user_input: The message text to send
+        conversation: The conversation object the message belongs to
+        last_response: The previous response once the session has chained
+            via previous_response_id, or None
+        echo: Print the streamed reply to the console
+    
+    Returns:
+        tuple: (response, chained) - the response after any MCP approvals have
+        been processed, and whether the next turn must chain from it.
+    """
+    # Send message to the agent
+    # - Until an MCP approval happens: use conversation.id; the server keeps
+    #   the context, without replaying the prior response's state
+    # - From the first MCP approval on: use previous_response_id
+    # Responses created with previous_response_id are not added to the
+    # conversation, so once a turn has chained, every later turn must keep
+    # chaining or it would lose the chained turns' context.
+    # Note: Follow-up traces may show "--" for Conversation ID in the portal,
+    # but the conversation context is still maintained server-side.
+    # Wrap in a tracer span to capture telemetry (duration, tokens, etc.)
+    with tracer.start_as_current_span("agent_chat") as span:
+        # Add custom attributes to the span for filtering/searching in traces
+        span.set_attribute("conversation.id", conversation.id)
+        span.set_attribute("agent.name", agent_name)
+        span.set_attribute("user.input_length", len(user_input))
+        
+        if last_response is None:
+            # No MCP approval yet in this conversation
+            response = stream_response(
+                echo=echo,
+                conversation=conversation.id,
+                extra_body=AGENT_EXTRA_BODY,
+                input=user_input,
+            )
+        else:
+            # The session already chains from the last response: continue it
+            # Note: Cannot include conversation param - API rejects it with previous_response_id
+            # Traces for follow-ups may not appear in portal's main trace list,
+            # but are visible when clicking on the first message's conversation detail
+            response = stream_response(
+                echo=echo,
+                previous_response_id=last_response.id,
+                extra_body=AGENT_EXTRA_BODY,
+                input=user_input,
+            )
+        
+        # Process any MCP approval requests (agent may need to query knowledge base)
+        response, had_mcp = process_response_with_mcp_approval(response, echo=echo)
+        
+        # Add response info to the span
+        span.set_attribute("response.id", response.id)
+        if hasattr(response, 'usage') and response.usage:
+            span.set_attribute("usage.input_tokens", response.usage.input_tokens or 0)
+            span.set_attribute("usage.output_tokens", response.usage.output_tokens or 0)
+            span.set_attribute("usage.total_tokens", response.usage.total_tokens or 0)
+    
+    return response, had_mcp or last_response is not None
+
+
+def build_batch_input(questions):
+    """
+    Combine several questions into a single numbered prompt.
+    
+    Sending related questions in one request costs one round-trip (and one
+    MCP approval chain) instead of one per question.
+    
+    Args:
+        questions: List of question strings
+    
+    Returns:
+        The combined input text for responses.create()
+    """
+    lines = [
+        "Answer each of the following questions separately.",
+        "Prefix each answer with its question number in the form [Q#]:",
+        "",
+    ]
+    lines.extend(f"[Q{i}] {question}" for i, question in enumerate(questions, 1))
+    return "\n".join(lines)
+
+
+def split_batch_answers(text, count):
+    """
+    Split a batched response into per-question answers using the [Q#] markers.
+    
+    Args:
+        text: The response output_text
+        count: Number of questions that were asked
+    
+    Returns:
+        List of answers in question order ("" for any missing answer),
+        or None if the response contains no [Q#] markers.
+    """
+    parts = BATCH_ANSWER_MARKER.split(text or "")
+    if len(parts) < 3:
+        return None
+    
+    # parts = [preamble, "1", answer1, "2", answer2, ...]
+    answers = {int(number): answer.strip() for number, answer in zip(parts[1::2], parts[2::2])}
+    return [answers.get(i, "") for i in range(1, count + 1)]
+
+
+def ask_batch(questions, conversation, last_response):
+    """
+    Ask several questions with a single responses.create() call.
+    
+    Args:
+        questions: List of question strings
+        conversation: The conversation object the questions belong to
+        last_response: The previous response once the session has chained
+            via previous_response_id, or None
+    
+    Returns:
+        tuple: (response, chained, answers) where answers is a list of
+        per-question answers, or None if the reply could not be split
+    """
+    response, chained = send_message(build_batch_input(questions), conversation, last_response, echo=False)
+    return response, chained, split_batch_answers(response.output_text, len(questions))
+
+
+def read_batch_questions():
+    """Read questions one per line until an empty line is entered."""
+    print("Enter one question per line. Press Enter on an empty line to send.")
+    questions = []
+    while True:
+        question = input(f"  Q{len(questions) + 1}: ").strip()
+        if not question:
+            return questions
+        questions.append(question)
+
+
 def main():
     """Main interactive loop for chatting with the agent."""
     
@@ -231,9 +736,11 @@ def main():
     print("Type your questions and press Enter to get responses.")
     print("The agent has access to knowledge bases via MCP.")
     print("Type 'new' to start a new conversation.")
+    print("Type 'batch' to ask several questions in one request.")
     print("Press Ctrl+C to exit.\n")
     
-    # Track the last response for chaining follow-up questions (MCP approval chain)
+    # The last response, kept once the conversation has gone through an MCP
+    # approval (from then on every message chains via previous_response_id)
     last_response = None
     
     while True:
@@ -252,55 +759,35 @@ def main():
                 print("Started new conversation!\n")
                 continue
             
-            # Send message to the agent
-            # - First message: use conversation.id to establish context
-            # - Follow-ups: use previous_response_id to maintain MCP approval chain
-            # Note: Follow-up traces may show "--" for Conversation ID in the portal,
-            # but the conversation context is still maintained server-side.
-            # Wrap in a tracer span to capture telemetry (duration, tokens, etc.)
-            with tracer.start_as_current_span("agent_chat") as span:
-                # Add custom attributes to the span for filtering/searching in traces
-                span.set_attribute("conversation.id", conversation.id)
-                span.set_attribute("agent.name", agent_name)
-                span.set_attribute("user.input_length", len(user_input))
-                
-                if last_response is None:
-                    # First message in the conversation
-                    response = openai_client.responses.create(
-                        conversation=conversation.id,
-                        extra_body={"agent": {"name": agent_name, "type": "agent_reference"}},
-                        input=user_input,
-                    )
-                else:
-                    # Follow-up message: use previous_response_id to maintain MCP chain
-                    # Note: Cannot include conversation param - API rejects it with previous_response_id
-                    # Traces for follow-ups may not appear in portal's main trace list,
-                    # but are visible when clicking on the first message's conversation detail
-                    response = openai_client.responses.create(
-                        previous_response_id=last_response.id,
-                        extra_body={"agent": {"name": agent_name, "type": "agent_reference"}},
-                        input=user_input,
-                    )
+            if user_input.lower() == 'batch':
+                questions = read_batch_questions()
+                if not questions:
+                    continue
                 
-                # Process any MCP approval requests (agent may need to query knowledge base)
-                response = process_response_with_mcp_approval(response)
+                response, chained, answers = ask_batch(questions, conversation, last_response)
+                last_response = response if chained else None
                 
-                # Add response info to the span
-                span.set_attribute("response.id", response.id)
-                if hasattr(response, 'usage') and response.usage:
-                    span.set_attribute("usage.input_tokens", response.usage.input_tokens or 0)
-                    span.set_attribute("usage.output_tokens", response.usage.output_tokens or 0)
-                    span.set_attribute("usage.total_tokens", response.usage.total_tokens or 0)
+                # Build the whole reply and write it in one call
+                if answers is None:
+                    # Agent ignored the [Q#] format - show the full reply
+                    _write(f"\nAssistant: {response.output_text}\n\n")
+                else:
+                    _write("".join(
+                        f"\n[Q{i}] {question}\nAssistant: {answer or '(no answer)'}\n"
+                        for i, (question, answer) in enumerate(zip(questions, answers), 1)
+                    ) + "\n")
+                _flush()
+                continue
             
-            # Store the response for chaining the next message
-            last_response = response
+            response, chained = send_message(user_input, conversation, last_response)
             
-            print(f"\nAssistant: {response.output_text}\n")
+            # Keep the response for chaining once the session has chained
+            # (the reply itself was already streamed to the console)
+            last_response = response if chained else None
             
         except KeyboardInterrupt:
             # Handle Ctrl+C gracefully
             # Force flush traces before exiting
-            from opentelemetry.sdk.trace import TracerProvider
             provider = trace.get_tracer_provider()
             if hasattr(provider, 'force_flush'):
                 provider.force_flush()
@@ -20,6 +20,7 @@ Key Concepts:
 - No agent configuration, tools, or MCP approval handling required
 - Clients are initialized once and reused for all requests (optimized for performance)
 - Conversation context is maintained server-side using the conversations API
+- Responses are streamed, so text appears as it is generated
 
 Required Environment Variables:
 -------------------------------
@@ -28,7 +29,9 @@ Required Environment Variables:
 
 Authentication:
 ---------------
-Uses DefaultAzureCredential which supports multiple authentication methods:
+Uses environment variables (service principal) or Azure CLI credentials (az login).
+Set FOUNDRY_CREDENTIAL_CHAIN=managed for managed identity only, or
+FOUNDRY_CREDENTIAL_CHAIN=default to use the full DefaultAzureCredential chain:
 - Azure CLI credentials (az login)
 - Managed Identity
 - Environment variables
@@ -42,9 +45,28 @@ Type 'new' to start a new conversation.
 
 import os
 import sys
+import time
+import atexit
+from functools import lru_cache
 from pathlib import Path
 from dotenv import load_dotenv
-from azure.identity import DefaultAzureCredential
+
+# Line editing and history for the input() prompts (stdlib on Linux/macOS;
+# on Windows, installing pyreadline3 provides the same module)
+try:
+    import readline  # noqa: F401
+except ImportError:
+    readline = None
+
+import httpx
+from openai import DefaultHttpxClient
+from azure.identity import (
+    AzureCliCredential,
+    ChainedTokenCredential,
+    DefaultAzureCredential,
+    EnvironmentCredential,
+    ManagedIdentityCredential,
+)
 from azure.ai.projects import AIProjectClient
 
 # Load environment variables from project root
@@ -56,24 +78,95 @@ load_dotenv(project_root / ".env")
 # INITIALIZATION (Done once at startup for optimal performance)
 # =============================================================================
 
+@lru_cache(maxsize=None)
+def create_credential():
+    """
+    Return the Azure credential used for authentication, created once per process.
+    
+    Every client built in this process shares the one credential (and its
+    token cache) instead of probing the credential chain again.
+    
+    FOUNDRY_CREDENTIAL_CHAIN selects the credential:
+      - "cli" (default): environment variables (service principal) + Azure CLI
+        login, which skips probing managed identity, VS Code, etc. on every start
+      - "managed": managed identity only (AZURE_CLIENT_ID selects a
+        user-assigned identity)
+      - "default": the full DefaultAzureCredential chain
+    Any other value falls back to "cli" with a warning.
+    """
+    chain = os.environ.get("FOUNDRY_CREDENTIAL_CHAIN", "cli").strip().lower()
+    if chain == "default":
+        return DefaultAzureCredential()
+    if chain == "managed":
+        return ManagedIdentityCredential(client_id=os.environ.get("AZURE_CLIENT_ID"))
+    if chain != "cli":
+        print(f"Warning: unknown FOUNDRY_CREDENTIAL_CHAIN={chain!r} (expected cli, managed or default); using cli")
+    return ChainedTokenCredential(EnvironmentCredential(), AzureCliCredential())
+
+
+@lru_cache(maxsize=4)
+def get_project_client(endpoint):
+    """
+    Return the AIProjectClient for an endpoint, created once per process.
+    
+    Repeated calls (e.g. re-running cells in a notebook) reuse the same client
+    and its credential instead of building and authenticating a new one.
+    """
+    return AIProjectClient(endpoint=endpoint, credential=create_credential())
+
+
+# Shared HTTP client for all Responses API calls
+# Keep-alive pooling lets every turn reuse the existing TLS connection, and
+# HTTP/2 (negotiated via ALPN, falls back to HTTP/1.1) compresses the repeated
+# headers. Retries cover transient connect errors.
+http_client = DefaultHttpxClient(
+    transport=httpx.HTTPTransport(
+        http2=True,
+        retries=3,
+        limits=httpx.Limits(
+            max_keepalive_connections=32,
+            max_connections=64,
+            keepalive_expiry=120,
+        ),
+    ),
+)
+# Close pooled connections cleanly on exit
+atexit.register(http_client.close)
+
+
+@lru_cache(maxsize=4)
+def get_openai_client(endpoint):
+    """Return the OpenAI-compatible client for an endpoint, sharing the pooled http_client."""
+    return get_project_client(endpoint).get_openai_client(http_client=http_client)
+
+
 print("Initializing Azure AI Foundry connection...")
 print(f"Endpoint: {os.environ['AZURE_AI_FOUNDRY_PROJECT_ENDPOINT']}")
 print(f"Model: {os.environ['AZURE_AI_FOUNDRY_MODEL_DEPLOYMENT_NAME']}")
 
 # Initialize the AI Project Client with Azure credentials (one-time setup)
 # This connection is reused for all subsequent requests
-project_client = AIProjectClient(
-    endpoint=os.environ["AZURE_AI_FOUNDRY_PROJECT_ENDPOINT"],
-    credential=DefaultAzureCredential(),
-)
+project_client = get_project_client(os.environ["AZURE_AI_FOUNDRY_PROJECT_ENDPOINT"])
 
 # Get the OpenAI-compatible client (one-time setup)
-# This client maintains connection pooling for optimal performance
-openai_client = project_client.get_openai_client()
+# It sends every request through the pooled http_client above
+openai_client = get_openai_client(os.environ["AZURE_AI_FOUNDRY_PROJECT_ENDPOINT"])
 
 # Cache the model name to avoid repeated environment lookups
 model_name = os.environ["AZURE_AI_FOUNDRY_MODEL_DEPLOYMENT_NAME"]
 
+# Stream events that carry the final response object
+FINAL_RESPONSE_EVENTS = ("response.completed", "response.incomplete", "response.failed")
+
+# Streamed text is flushed to the terminal at most this often / after this
+# many characters, instead of once per token
+STDOUT_FLUSH_INTERVAL_SECONDS = 0.03
+STDOUT_FLUSH_CHARS = 256
+
+# stdout methods bound once for the per-token streaming path
+_write = sys.stdout.write
+_flush = sys.stdout.flush
+
 
 # =============================================================================
 # INTERACTIVE CHAT LOOP
@@ -86,6 +179,60 @@ def create_conversation():
     return conversation.id
 
 
+def stream_response(**request):
+    """
+    Create a streamed response, printing text deltas as they arrive.
+    
+    The user sees the first tokens immediately instead of waiting for the
+    full generation. Ctrl+C while an answer streams stops that answer and
+    returns to the prompt (Ctrl+C at the prompt still exits).
+    
+    Args:
+        **request: Arguments for openai_client.responses.create()
+    
+    Returns:
+        The final response (same shape as a non-streaming responses.create()),
+        or None if the answer was stopped
+    """
+    stream = openai_client.responses.create(stream=True, **request)
+    
+    final_response = None
+    unflushed_chars = 0  # Text written to stdout since the last flush
+    last_flush = time.monotonic()
+    
+    print("\nAssistant: ", end="", flush=True)
+    try:
+        for event in stream:
+            event_type = event.type
+            
+            if event_type == "response.output_text.delta":
+                delta = event.delta
+                _write(delta)
+                
+                # Batch terminal flushes: one write() syscall per burst of tokens
+                unflushed_chars += len(delta)
+                now = time.monotonic()
+                if unflushed_chars > STDOUT_FLUSH_CHARS or now - last_flush > STDOUT_FLUSH_INTERVAL_SECONDS:
+                    _flush()
+                    unflushed_chars = 0
+                    last_flush = now
+            
+            elif event_type in FINAL_RESPONSE_EVENTS:
+                final_response = event.response
+            
+            elif event_type == "error":
+                raise RuntimeError(f"Stream error: {getattr(event, 'message', event)}")
+    except KeyboardInterrupt:
+        # Stop only this answer: close the connection and go back to the prompt
+        stream.close()
+        _write("\n[stopped]")
+    finally:
+        # Drain any buffered text, including when the stream fails mid-way
+        print("\n", flush=True)
+    
+    return final_response
+
+
 def main():
     """Main interactive loop for chatting with the model."""
     
@@ -115,16 +262,14 @@ def main():
                 print("Started new conversation!\n")
                 continue
             
-            # Make a call to the model with the conversation ID
+            # Stream a call to the model with the conversation ID
             # The conversation maintains all context server-side
-            response = openai_client.responses.create(
+            stream_response(
                 model=model_name,
                 conversation=conversation_id,
                 input=user_input,
             )
             
-            print(f"\nAssistant: {response.output_text}\n")
-            
         except KeyboardInterrupt:
             # Handle Ctrl+C gracefully
             print("\n\nExiting... Goodbye!")
@@ -13,9 +13,12 @@ Key Features:
     - STREAMS responses token-by-token as they're generated
     - Maintains conversation history client-side (required for published apps)
     - Interactive multi-turn conversation support
+    - Async streaming (AsyncOpenAI + async for) on a shared HTTP/2 connection pool
 
 Prerequisites:
-    - Azure CLI authenticated (az login)
+    - Azure CLI authenticated (az login), or service principal environment variables
+      (set FOUNDRY_CREDENTIAL_CHAIN=managed for managed identity only, or
+      FOUNDRY_CREDENTIAL_CHAIN=default for the full DefaultAzureCredential chain)
     - AZURE_AI_FOUNDRY_APP_ENDPOINT set in .env file
 
 Usage:
@@ -28,10 +31,45 @@ Reference:
 import os
 import sys
 import json
+import signal
+import asyncio
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
 from dotenv import load_dotenv
-from openai import OpenAI
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
+
+# Line editing and history for the input() prompts (stdlib on Linux/macOS;
+# on Windows, installing pyreadline3 provides the same module)
+try:
+    import readline  # noqa: F401
+except ImportError:
+    readline = None
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from azure.identity import (
+    AzureCliCredential,
+    ChainedTokenCredential,
+    DefaultAzureCredential,
+    EnvironmentCredential,
+    ManagedIdentityCredential,
+)
+
+# orjson is optional - used for faster JSON pretty-printing in DEBUG output
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# prompt_toolkit is optional - async prompt with persistent input history
+# (falls back to input() when it is not installed)
+try:
+    from prompt_toolkit import PromptSession
+    from prompt_toolkit.history import FileHistory
+except ImportError:
+    PromptSession = None
 
 # Load environment variables from project root
 # Navigate up from clients/published/ to find .env
@@ -54,6 +92,17 @@ if not APP_ENDPOINT:
 # DEBUG = all events (verbose), INFO = tool calls only, WARN = errors only, OFF = no logging
 LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
 
+# Log levels that show tool calls as they happen
+VERBOSE_LOG_LEVELS = frozenset({"DEBUG", "INFO"})
+
+# DEBUG output only pretty-prints tool JSON up to this size; larger payloads
+# are shown raw and truncated instead of being parsed and re-formatted
+PRETTY_PRINT_MAX_CHARS = 2000
+
+# Maximum number of history messages (user + assistant) sent with each request
+# Older turns are dropped once the limit is reached; 0 keeps the full history
+MAX_HISTORY_MESSAGES = int(os.environ.get("MAX_HISTORY_MESSAGES", "40"))
+
 # =============================================================================
 # INITIALIZATION
 # =============================================================================
@@ -62,54 +111,399 @@ print("Initializing Foundry Application Client (Streaming)...")
 print(f"Endpoint: {APP_ENDPOINT}")
 print(f"Log Level: {LOG_LEVEL}")
 
-# Create Azure AD token provider for authentication
-token_provider = get_bearer_token_provider(
-    DefaultAzureCredential(),
-    "https://ai.azure.com/.default"
+
+@lru_cache(maxsize=None)
+def create_credential():
+    """
+    Return the Azure credential used for authentication, created once per process.
+    
+    Every client built in this process shares the one credential (and its
+    token cache) instead of probing the credential chain again.
+    
+    FOUNDRY_CREDENTIAL_CHAIN selects the credential:
+      - "cli" (default): environment variables (service principal) + Azure CLI
+        login, which skips probing managed identity, VS Code, etc. on every start
+      - "managed": managed identity only (AZURE_CLIENT_ID selects a
+        user-assigned identity)
+      - "default": the full DefaultAzureCredential chain
+    Any other value falls back to "cli" with a warning.
+    """
+    chain = os.environ.get("FOUNDRY_CREDENTIAL_CHAIN", "cli").strip().lower()
+    if chain == "default":
+        return DefaultAzureCredential()
+    if chain == "managed":
+        return ManagedIdentityCredential(client_id=os.environ.get("AZURE_CLIENT_ID"))
+    if chain != "cli":
+        print(f"Warning: unknown FOUNDRY_CREDENTIAL_CHAIN={chain!r} (expected cli, managed or default); using cli")
+    return ChainedTokenCredential(EnvironmentCredential(), AzureCliCredential())
+
+
+# Azure AD credential and token scope for authentication
+credential = create_credential()
+TOKEN_SCOPE = "https://ai.azure.com/.default"
+
+# Refresh the cached token when it is this close to expiring
+TOKEN_REFRESH_MARGIN_SECONDS = 300
+
+# Streamed text is flushed to the terminal at most this often / after this
+# many characters, instead of once per token
+STDOUT_FLUSH_INTERVAL_SECONDS = 0.03
+STDOUT_FLUSH_CHARS = 256
+
+# stdout methods bound once for the per-token streaming path
+_write = sys.stdout.write
+_flush = sys.stdout.flush
+
+# Input history for the interactive prompt (used when prompt_toolkit is installed)
+INPUT_HISTORY_FILE = project_root / ".foundry_history"
+
+# Cached bearer token (reused across turns until near expiry)
+_token_cache = {"token": None, "expires_on": 0}
+
+
+def get_token(force=False):
+    """Return a cached bearer token, acquiring a new one only when near expiry."""
+    if force or time.time() > _token_cache["expires_on"] - TOKEN_REFRESH_MARGIN_SECONDS:
+        access_token = credential.get_token(TOKEN_SCOPE)
+        _token_cache.update(token=access_token.token, expires_on=access_token.expires_on)
+    return _token_cache["token"]
+
+
+# Shared HTTP client with a tuned keep-alive pool
+# Streaming turns reuse the same TLS connection instead of reconnecting
+# HTTP/2 is negotiated via ALPN (falls back to HTTP/1.1 if unsupported)
+http_client = DefaultAsyncHttpxClient(
+    transport=httpx.AsyncHTTPTransport(
+        http2=True,
+        retries=3,
+        limits=httpx.Limits(
+            max_keepalive_connections=32,
+            max_connections=64,
+            keepalive_expiry=120,
+        ),
+    ),
 )
 
-# Create OpenAI client pointing to the published application
-client = OpenAI(
-    api_key=token_provider(),
+# Create async OpenAI client pointing to the published application
+client = AsyncOpenAI(
+    api_key=get_token(),
     base_url=APP_ENDPOINT,
-    default_query={"api-version": "2025-11-15-preview"}
+    default_query={"api-version": "2025-11-15-preview"},
+    http_client=http_client,
 )
 
 print("Connected to Agent Application (Streaming Mode)")
 
 
-def refresh_token():
-    """Refresh the authentication token if needed."""
-    global client
-    client.api_key = token_provider()
+def refresh_token(force=False):
+    """Refresh the authentication token if it is close to expiring (or if forced)."""
+    token = get_token(force=force)
+    if client.api_key != token:
+        client.api_key = token
 
 
-def build_conversation_input(history, new_message):
+def format_json(text):
     """
-    Build the input for a multi-turn conversation.
+    Pretty-print a JSON string with 2-space indentation.
     
-    Published applications are stateless - we must send the full
-    conversation history with each request.
+    Uses orjson when it is installed, otherwise the standard json module.
+    Raises ValueError (or TypeError) if text is not valid JSON.
     """
-    messages = []
+    if orjson is not None:
+        return orjson.dumps(orjson.loads(text), option=orjson.OPT_INDENT_2).decode()
+    return json.dumps(json.loads(text), indent=2)
+
+
+@dataclass
+class StreamState:
+    """Mutable state shared by the stream event handlers for one response."""
+    log_level: str
+    text_parts: list = field(default_factory=list)  # Streamed text chunks, joined once at the end
+    final_response: object = None
+    tool_calls: list = field(default_factory=list)  # Track all tool calls for this response
+    # Track state for clean output formatting
+    is_streaming_text: bool = False
+    unflushed_chars: int = 0  # Text written to stdout since the last flush
+    last_flush: float = 0.0
+    pending_tool_calls: dict = field(default_factory=dict)  # Track in-progress tool calls by ID (for MCP calls)
+    pending_mcp_args: dict = field(default_factory=dict)  # Streaming MCP argument chunks (list) by item_id
+
+
+# =============================================================================
+# STREAM EVENT HANDLERS
+# =============================================================================
+# Each handler receives the event and the StreamState. A handler returns True
+# to stop reading the stream. Handlers are looked up by event type in
+# EVENT_HANDLERS (one dict lookup per event instead of an if/elif chain).
+# Events and output items are typed SDK models, so their declared fields are
+# read directly; type-specific fields are only read inside the matching branch.
+
+# =====================================================================
+# MCP TOOL EVENTS - Azure Foundry uses MCP (Model Context Protocol)
+# Log at INFO level or higher (INFO, DEBUG)
+# =====================================================================
+
+def _on_output_item_added(event, state):
+    """A new output item is starting."""
+    item = event.item
+    if item:
+        item_type = item.type
+        
+        # Handle MCP tool calls (Azure Foundry's way)
+        if item_type == "mcp_call":
+            item_id = item.id
+            tool_name = item.name or item.server_label or 'unknown_tool'
+            if state.log_level in VERBOSE_LOG_LEVELS:
+                print(f"\n🔧 Calling tool: {tool_name}")
+            state.pending_tool_calls[item_id] = {
+                'name': tool_name,
+                'arguments': '',
+                'id': item_id
+            }
+        
+        # Handle MCP list tools (discovery phase)
+        elif item_type == "mcp_list_tools":
+            server_label = item.server_label
+            if state.log_level == "DEBUG":
+                print(f"\n🔍 Discovering tools from: {server_label}")
+        
+        # Handle standard function calls (if any)
+        elif item_type == "function_call":
+            item_id = item.id
+            func_name = item.name
+            if state.log_level in VERBOSE_LOG_LEVELS:
+                print(f"\n🔧 Calling tool: {func_name}")
+            state.pending_tool_calls[item_id] = {
+                'name': func_name,
+                'arguments': '',
+                'call_id': item.call_id
+            }
+
+
+def _on_mcp_call_in_progress(event, state):
+    """MCP call starting."""
+    item_id = event.item_id
+    if item_id and item_id not in state.pending_mcp_args:
+        state.pending_mcp_args[item_id] = []
+
+
+def _on_mcp_call_arguments_delta(event, state):
+    """MCP call arguments streaming."""
+    item_id = event.item_id
+    delta = event.delta
+    if item_id:
+        state.pending_mcp_args.setdefault(item_id, []).append(delta)
+
+
+def _on_mcp_call_arguments_done(event, state):
+    """MCP call arguments complete."""
+    item_id = event.item_id
+    arguments = event.arguments
+    if arguments is None:
+        # Fall back to the streamed argument chunks
+        arguments = "".join(state.pending_mcp_args.get(item_id, [])) or '{}'
     
-    for msg in history:
-        messages.append({
-            "type": "message",
-            "role": msg["role"],
-            "content": msg["content"]
+    # Pretty print the arguments (only at DEBUG level)
+    if state.log_level == "DEBUG" and len(arguments) > PRETTY_PRINT_MAX_CHARS:
+        print(f"   Arguments: {arguments[:200]}... ({len(arguments)} chars)")
+    elif state.log_level == "DEBUG":
+        try:
+            args_display = format_json(arguments) if arguments else "{}"
+            # Indent each line for clean display
+            args_lines = args_display.split('\n')
+            if len(args_lines) > 10:
+                # Truncate if too long
+                args_display = '\n'.join(args_lines[:10]) + '\n   ... (truncated)'
+            args_display = '\n'.join('   ' + line for line in args_display.split('\n'))
+            print(f"   Arguments:\n{args_display}")
+        except (ValueError, TypeError):
+            print(f"   Arguments: {arguments[:200]}..." if len(arguments) > 200 else f"   Arguments: {arguments}")
+    
+    # Store for tracking
+    if item_id and item_id in state.pending_tool_calls:
+        state.pending_tool_calls[item_id]['arguments'] = arguments
+
+
+def _on_mcp_call_completed(event, state):
+    """MCP call completed."""
+    item_id = event.item_id
+    if item_id and item_id in state.pending_tool_calls:
+        tool_info = state.pending_tool_calls[item_id]
+        state.tool_calls.append({
+            'name': tool_info['name'],
+            'arguments': tool_info.get('arguments', ''),
+            'id': item_id
         })
+        if state.log_level in VERBOSE_LOG_LEVELS:
+            print(f"   ✅ Tool call completed")
+        del state.pending_tool_calls[item_id]
+    if item_id in state.pending_mcp_args:
+        del state.pending_mcp_args[item_id]
+
+
+def _on_mcp_list_tools_completed(event, state):
+    """MCP list tools completed."""
+    if state.log_level == "DEBUG":
+        print(f"   ✅ Tool discovery completed")
+
+
+def _on_output_item_done(event, state):
+    """An output item is complete."""
+    item = event.item
+    if item:
+        item_type = item.type
+        
+        # Handle MCP list tools completion with tool info
+        if item_type == "mcp_list_tools":
+            tools = item.tools
+            if tools and state.log_level == "DEBUG":
+                tool_names = [t.name for t in tools[:5]]
+                print(f"   Available tools: {', '.join(tool_names)}")
+                if len(tools) > 5:
+                    print(f"   ... and {len(tools) - 5} more")
+        
+        # Handle standard function_call completion
+        elif item_type == "function_call":
+            item_id = item.id
+            func_name = item.name
+            func_args = item.arguments
+            call_id = item.call_id
+            
+            if state.log_level == "DEBUG" and len(func_args) > PRETTY_PRINT_MAX_CHARS:
+                print(f"   Arguments: {func_args[:200]}... ({len(func_args)} chars)")
+            elif state.log_level == "DEBUG":
+                try:
+                    args_display = format_json(func_args) if func_args else "{}"
+                    args_display = '\n'.join('   ' + line for line in args_display.split('\n'))
+                    print(f"   Arguments:\n{args_display}")
+                except (ValueError, TypeError):
+                    print(f"   Arguments: {func_args}")
+            
+            state.tool_calls.append({
+                'name': func_name,
+                'arguments': func_args,
+                'call_id': call_id
+            })
+            
+            if item_id in state.pending_tool_calls:
+                del state.pending_tool_calls[item_id]
+        
+        elif item_type == "function_call_output":
+            # Tool result came back (only show at DEBUG level)
+            if state.log_level == "DEBUG":
+                output = item.output
+                
+                if len(output) > PRETTY_PRINT_MAX_CHARS:
+                    # Too large to pretty-print cheaply - show the raw start only
+                    print(f"📤 Tool result: {output[:500]}... ({len(output)} chars)")
+                else:
+                    display_output = output[:500] + "..." if len(output) > 500 else output
+                    try:
+                        display_output = format_json(output)
+                        if len(display_output) > 500:
+                            display_output = display_output[:500] + "... (truncated)"
+                        display_output = '\n'.join('   ' + line for line in display_output.split('\n'))
+                        print(f"📤 Tool result:\n{display_output}")
+                    except (ValueError, TypeError):
+                        print(f"📤 Tool result: {display_output}")
+                print()
+        
+        elif item_type == "message":
+            # Check for annotations (citations) - most messages have none
+            content = item.content
+            if not content:
+                return
+            last_content = content[-1]
+            if last_content.type != "output_text" or not last_content.annotations:
+                return
+            print("\n\n📚 Citations:")
+            for ann in last_content.annotations:
+                match ann.type:
+                    case "url_citation":
+                        print(f"   - {ann.url}")
+                    case "file_citation":
+                        print(f"   - {ann.file_id}")
+
+
+# =====================================================================
+# TEXT STREAMING EVENTS - The actual assistant response
+# =====================================================================
+
+def _on_output_text_delta(event, state):
+    """Streaming text delta - write to stdout, flushing every few ms / chars."""
+    if not state.is_streaming_text:
+        # First text chunk - print the "Assistant:" header
+        print("\nAssistant: ", end="", flush=True)
+        state.is_streaming_text = True
+        state.last_flush = time.monotonic()
     
-    messages.append({
-        "type": "message",
-        "role": "user",
-        "content": new_message
-    })
+    delta = event.delta
+    _write(delta)
+    state.text_parts.append(delta)
     
-    return messages
+    # Batch terminal flushes: one write() syscall per burst of tokens
+    state.unflushed_chars += len(delta)
+    now = time.monotonic()
+    if state.unflushed_chars > STDOUT_FLUSH_CHARS or now - state.last_flush > STDOUT_FLUSH_INTERVAL_SECONDS:
+        _flush()
+        state.unflushed_chars = 0
+        state.last_flush = now
+
+
+def _on_completed(event, state):
+    """Full response complete."""
+    state.final_response = event.response
 
 
-def stream_response(input_items, log_level=None):
+def _on_error(event, state):
+    """Handle errors."""
+    print(f"\n\n❌ Stream Error: {event.message}")
+    return True  # Stop reading the stream
+
+
+# Event type -> handler. Events without a handler (response.created,
+# response.text.done, ...) need no action and are skipped.
+EVENT_HANDLERS = {
+    "response.output_text.delta": _on_output_text_delta,
+    "response.output_item.added": _on_output_item_added,
+    "response.output_item.done": _on_output_item_done,
+    "response.mcp_call.in_progress": _on_mcp_call_in_progress,
+    "response.mcp_call_arguments.delta": _on_mcp_call_arguments_delta,
+    "response.mcp_call_arguments.done": _on_mcp_call_arguments_done,
+    "response.mcp_call.completed": _on_mcp_call_completed,
+    "response.mcp_list_tools.completed": _on_mcp_list_tools_completed,
+    "response.completed": _on_completed,
+    "error": _on_error,
+}
+
+
+async def _dispatch_events(stream, state):
+    """Route each stream event to its handler until the stream ends or a handler stops it."""
+    async for event in stream:
+        handler = EVENT_HANDLERS.get(event.type)
+        if handler and handler(event, state):
+            break
+
+
+async def _dispatch_events_debug(stream, state):
+    """Like _dispatch_events, but first prints the data fields of each new event type."""
+    seen_event_types = set()
+    async for event in stream:
+        event_type = event.type
+        
+        if event_type not in seen_event_types:
+            seen_event_types.add(event_type)
+            print(f"\n[DEBUG] Event: {event_type}")
+            # model_dump() returns only the event's fields (no pydantic internals)
+            for attr, val in event.model_dump(exclude_none=True).items():
+                print(f"[DEBUG]   {attr}: {str(val)[:150]}")
+        
+        handler = EVENT_HANDLERS.get(event_type)
+        if handler and handler(event, state):
+            break
+
+
+async def stream_response(input_items, log_level=None):
     """
     Send a request and stream the response token-by-token.
     
@@ -126,264 +520,80 @@ def stream_response(input_items, log_level=None):
     # Use provided log_level or fall back to global LOG_LEVEL
     current_log_level = log_level or LOG_LEVEL
     
-    stream = client.responses.create(
+    stream = await client.responses.create(
         stream=True,
         input=input_items,
     )
     
-    full_text = ""
-    final_response = None
-    tool_calls = []  # Track all tool calls for this response
-    
-    # Track state for clean output formatting
-    is_streaming_text = False
-    pending_tool_calls = {}  # Track in-progress tool calls by ID (for MCP calls)
-    pending_mcp_args = {}  # Track streaming MCP arguments by item_id
-    
-    # Debug: collect all unique event types seen
-    seen_event_types = set()
+    state = StreamState(log_level=current_log_level)
     
-    # Pydantic internal attributes to skip in debug output
-    SKIP_ATTRS = {'model_computed_fields', 'model_config', 'model_extra', 
-                  'model_fields', 'model_fields_set', 'model_post_init',
-                  'model_construct', 'model_copy', 'model_dump', 'model_dump_json',
-                  'model_json_schema', 'model_parametrized_name', 'model_rebuild',
-                  'model_validate', 'model_validate_json', 'model_validate_strings'}
+    # Pick the event loop once per response so the common (non-DEBUG) path
+    # carries no per-event debug checks
+    dispatch_events = _dispatch_events_debug if current_log_level == "DEBUG" else _dispatch_events
     
-    for event in stream:
-        event_type = getattr(event, 'type', None)
-        
-        # DEBUG level: print all events with meaningful details (skip pydantic internals)
-        if current_log_level == "DEBUG" and event_type not in seen_event_types:
-            seen_event_types.add(event_type)
-            print(f"\n[DEBUG] Event: {event_type}")
-            # Print only meaningful attributes (skip pydantic model internals)
-            for attr in dir(event):
-                if not attr.startswith('_') and attr not in SKIP_ATTRS:
-                    try:
-                        val = getattr(event, attr)
-                        if not callable(val):
-                            val_str = str(val)[:150] if len(str(val)) > 150 else str(val)
-                            print(f"[DEBUG]   {attr}: {val_str}")
-                    except:
-                        pass
-        
-        if event_type == "response.created":
-            # Response started - don't print "Assistant:" yet, wait for content
-            pass
-        
-        # =====================================================================
-        # MCP TOOL EVENTS - Azure Foundry uses MCP (Model Context Protocol)
-        # Log at INFO level or higher (INFO, DEBUG)
-        # =====================================================================
-        
-        elif event_type == "response.output_item.added":
-            # A new output item is starting
-            item = getattr(event, 'item', None)
-            if item:
-                item_type = getattr(item, 'type', None)
-                item_id = getattr(item, 'id', None)
-                
-                # Handle MCP tool calls (Azure Foundry's way)
-                if item_type == "mcp_call":
-                    tool_name = getattr(item, 'name', None) or getattr(item, 'server_label', 'unknown_tool')
-                    if current_log_level in ("DEBUG", "INFO"):
-                        print(f"\n🔧 Calling tool: {tool_name}")
-                    pending_tool_calls[item_id] = {
-                        'name': tool_name,
-                        'arguments': '',
-                        'id': item_id
-                    }
-                
-                # Handle MCP list tools (discovery phase)
-                elif item_type == "mcp_list_tools":
-                    server_label = getattr(item, 'server_label', 'unknown')
-                    if current_log_level == "DEBUG":
-                        print(f"\n🔍 Discovering tools from: {server_label}")
-                
-                # Handle standard function calls (if any)
-                elif item_type == "function_call":
-                    func_name = getattr(item, 'name', 'unknown_tool')
-                    if current_log_level in ("DEBUG", "INFO"):
-                        print(f"\n🔧 Calling tool: {func_name}")
-                    pending_tool_calls[item_id] = {
-                        'name': func_name,
-                        'arguments': '',
-                        'call_id': getattr(item, 'call_id', item_id)
-                    }
-        
-        # MCP call starting
-        elif event_type == "response.mcp_call.in_progress":
-            item_id = getattr(event, 'item_id', None)
-            if item_id and item_id not in pending_mcp_args:
-                pending_mcp_args[item_id] = ""
-        
-        # MCP call arguments streaming
-        elif event_type == "response.mcp_call_arguments.delta":
-            item_id = getattr(event, 'item_id', None)
-            delta = getattr(event, 'delta', '')
-            if item_id:
-                if item_id not in pending_mcp_args:
-                    pending_mcp_args[item_id] = ""
-                pending_mcp_args[item_id] += delta
-        
-        # MCP call arguments complete
-        elif event_type == "response.mcp_call_arguments.done":
-            item_id = getattr(event, 'item_id', None)
-            arguments = getattr(event, 'arguments', '{}')
-            
-            # Pretty print the arguments (only at DEBUG level)
-            if current_log_level == "DEBUG":
-                try:
-                    args_parsed = json.loads(arguments) if arguments else {}
-                    args_display = json.dumps(args_parsed, indent=2)
-                    # Indent each line for clean display
-                    args_lines = args_display.split('\n')
-                    if len(args_lines) > 10:
-                        # Truncate if too long
-                        args_display = '\n'.join(args_lines[:10]) + '\n   ... (truncated)'
-                    args_display = '\n'.join('   ' + line for line in args_display.split('\n'))
-                    print(f"   Arguments:\n{args_display}")
-                except:
-                    print(f"   Arguments: {arguments[:200]}..." if len(arguments) > 200 else f"   Arguments: {arguments}")
-            
-            # Store for tracking
-            if item_id and item_id in pending_tool_calls:
-                pending_tool_calls[item_id]['arguments'] = arguments
-        
-        # MCP call completed
-        elif event_type == "response.mcp_call.completed":
-            item_id = getattr(event, 'item_id', None)
-            if item_id and item_id in pending_tool_calls:
-                tool_info = pending_tool_calls[item_id]
-                tool_calls.append({
-                    'name': tool_info['name'],
-                    'arguments': tool_info.get('arguments', ''),
-                    'id': item_id
-                })
-                if current_log_level in ("DEBUG", "INFO"):
-                    print(f"   ✅ Tool call completed")
-                del pending_tool_calls[item_id]
-            if item_id in pending_mcp_args:
-                del pending_mcp_args[item_id]
-        
-        # MCP list tools completed
-        elif event_type == "response.mcp_list_tools.completed":
-            if current_log_level == "DEBUG":
-                print(f"   ✅ Tool discovery completed")
-        
-        elif event_type == "response.output_item.done":
-            # An output item is complete
-            item = getattr(event, 'item', None)
-            if item:
-                item_type = getattr(item, 'type', None)
-                item_id = getattr(item, 'id', None)
-                
-                # Handle MCP list tools completion with tool info
-                if item_type == "mcp_list_tools":
-                    tools = getattr(item, 'tools', [])
-                    if tools and current_log_level == "DEBUG":
-                        tool_names = [getattr(t, 'name', 'unknown') for t in tools[:5]]
-                        print(f"   Available tools: {', '.join(tool_names)}")
-                        if len(tools) > 5:
-                            print(f"   ... and {len(tools) - 5} more")
-                
-                # Handle standard function_call completion
-                elif item_type == "function_call":
-                    func_name = getattr(item, 'name', 'unknown_tool')
-                    func_args = getattr(item, 'arguments', '{}')
-                    call_id = getattr(item, 'call_id', item_id)
-                    
-                    if current_log_level == "DEBUG":
-                        try:
-                            args_parsed = json.loads(func_args) if func_args else {}
-                            args_display = json.dumps(args_parsed, indent=2)
-                            args_display = '\n'.join('   ' + line for line in args_display.split('\n'))
-                            print(f"   Arguments:\n{args_display}")
-                        except:
-                            print(f"   Arguments: {func_args}")
-                    
-                    tool_calls.append({
-                        'name': func_name,
-                        'arguments': func_args,
-                        'call_id': call_id
-                    })
-                    
-                    if item_id in pending_tool_calls:
-                        del pending_tool_calls[item_id]
-                
-                elif item_type == "function_call_output":
-                    # Tool result came back (only show at DEBUG level)
-                    if current_log_level == "DEBUG":
-                        output = getattr(item, 'output', '')
-                        display_output = output[:500] + "..." if len(output) > 500 else output
-                        
-                        try:
-                            output_parsed = json.loads(output)
-                            display_output = json.dumps(output_parsed, indent=2)
-                            if len(display_output) > 500:
-                                display_output = display_output[:500] + "... (truncated)"
-                            display_output = '\n'.join('   ' + line for line in display_output.split('\n'))
-                            print(f"📤 Tool result:\n{display_output}")
-                        except:
-                            print(f"📤 Tool result: {display_output}")
-                        print()
-                
-                elif item_type == "message":
-                    # Check for annotations (citations)
-                    content = getattr(item, 'content', [])
-                    if content and len(content) > 0:
-                        last_content = content[-1]
-                        if getattr(last_content, 'type', None) == "output_text":
-                            annotations = getattr(last_content, 'annotations', [])
-                            if annotations:
-                                print("\n\n📚 Citations:")
-                                for ann in annotations:
-                                    if getattr(ann, 'type', None) == "url_citation":
-                                        print(f"   - {ann.url}")
-                                    elif getattr(ann, 'type', None) == "file_citation":
-                                        print(f"   - {getattr(ann, 'file_id', 'unknown')}")
-        
-        # =====================================================================
-        # TEXT STREAMING EVENTS - The actual assistant response
-        # =====================================================================
-        
-        elif event_type == "response.output_text.delta":
-            # Streaming text delta - print immediately
-            if not is_streaming_text:
-                # First text chunk - print the "Assistant:" header
-                print("\nAssistant: ", end="", flush=True)
-                is_streaming_text = True
-            
-            delta = getattr(event, 'delta', '')
-            print(delta, end="", flush=True)
-            full_text += delta
-            
-        elif event_type == "response.text.done":
-            # Text generation complete
-            pass
-            
-        elif event_type == "response.completed":
-            # Full response complete
-            final_response = getattr(event, 'response', None)
-            
-        elif event_type == "error":
-            # Handle errors
-            error = getattr(event, 'error', None)
-            print(f"\n\n❌ Stream Error: {error}")
-            break
+    # The context manager closes the connection even if an error event stops the loop early
+    async with stream:
+        await dispatch_events(stream, state)
     
-    print("\n")  # New line after streaming completes
+    print("\n", flush=True)  # New line after streaming completes (drains buffered text)
     
     # Print summary if tools were called (at INFO or DEBUG level)
-    if tool_calls and current_log_level in ("DEBUG", "INFO"):
-        print(f"📊 Tools used in this response: {', '.join(tc['name'] for tc in tool_calls)}")
+    if state.tool_calls and current_log_level in VERBOSE_LOG_LEVELS:
+        print(f"📊 Tools used in this response: {', '.join(tc['name'] for tc in state.tool_calls)}")
         print()
     
-    return full_text, final_response, tool_calls
+    return "".join(state.text_parts), state.final_response, state.tool_calls
+
+
+def trim_history(history):
+    """
+    Drop the oldest turns once the history exceeds MAX_HISTORY_MESSAGES.
+    
+    Published applications are stateless, so the whole history is sent (and
+    billed as input tokens) on every request. Trimming keeps that payload
+    bounded in long sessions. The history always restarts at a user message.
+    
+    Args:
+        history: Conversation items in request input format (modified in place)
+    """
+    if MAX_HISTORY_MESSAGES and len(history) > MAX_HISTORY_MESSAGES:
+        del history[:len(history) - MAX_HISTORY_MESSAGES]
+        # Never start the context with an orphaned assistant reply
+        while history and history[0]["role"] != "user":
+            del history[0]
+
+
+def create_prompt_session():
+    """
+    Return a prompt_toolkit session with history kept in INPUT_HISTORY_FILE,
+    or None to read input with input().
+    """
+    if PromptSession is None:
+        return None
+    return PromptSession(history=FileHistory(str(INPUT_HISTORY_FILE)))
+
+
+async def read_input(session, message):
+    """
+    Prompt for a line of input, awaiting it when prompt_toolkit is installed.
+    
+    Without prompt_toolkit, input() blocks the event loop (nothing else runs
+    while waiting at the prompt). asyncio.run's SIGINT handler would only
+    cancel the main task, which input() doesn't notice until Enter, so the
+    default handler is restored while it waits: Ctrl+C raises
+    KeyboardInterrupt at once and exits.
+    """
+    if session is not None:
+        return await session.prompt_async(message)
+    
+    previous_handler = signal.signal(signal.SIGINT, signal.default_int_handler)
+    try:
+        return input(message)
+    finally:
+        signal.signal(signal.SIGINT, previous_handler)
 
 
-def main():
+async def main():
     """Main interactive loop with streaming responses."""
     
     # Use LOG_LEVEL from environment, can be overridden with --debug flag
@@ -398,7 +608,7 @@ def main():
     print("Foundry Agent Application - Streaming Mode")
     print("=" * 60)
     print("Responses stream token-by-token for real-time feedback.")
-    if current_log_level in ("DEBUG", "INFO"):
+    if current_log_level in VERBOSE_LOG_LEVELS:
         print("🔧 Tool calls are displayed as they happen.")
     if current_log_level == "DEBUG":
         print("🐛 DEBUG MODE - All events will be logged")
@@ -413,23 +623,28 @@ def main():
     print("  Ctrl+C   - Exit")
     print("=" * 60 + "\n")
     
-    # Maintain conversation history locally
-    # Published applications are stateless - no server-side history
-    conversation_history = []
-    total_tool_calls = []  # Track all tools used in session
+    # Maintain conversation history locally, already in request input format
+    # Published applications are stateless - the full history is sent with
+    # each request, so items are appended once instead of rebuilt every turn
+    input_items = []
+    total_tool_calls = Counter()  # Calls per tool name in this session (updated per response)
+    session = create_prompt_session()
     
     while True:
         try:
             # Get user input
-            user_input = input("You: ").strip()
+            # prompt_toolkit awaits the prompt on the event loop (with history);
+            # without it, input() is read directly - an executor thread blocked
+            # in input() would stall exit on Ctrl+C
+            user_input = (await read_input(session, "You: ")).strip()
             
             if not user_input:
                 continue
             
             # Handle special commands
             if user_input.lower() == 'new':
-                conversation_history = []
-                total_tool_calls = []
+                input_items = []
+                total_tool_calls = Counter()
                 print("Started new conversation!\n")
                 continue
             
@@ -452,45 +667,53 @@ def main():
                 # Show tool usage summary
                 if total_tool_calls:
                     print("\n📊 Tools used in this session:")
-                    tool_counts = {}
-                    for tc in total_tool_calls:
-                        tool_counts[tc['name']] = tool_counts.get(tc['name'], 0) + 1
-                    for name, count in tool_counts.items():
+                    for name, count in total_tool_calls.most_common():
                         print(f"   {name}: {count} call(s)")
                     print()
                 else:
                     print("\n📊 No tools have been called yet in this session.\n")
                 continue
             
-            # Refresh token before making request
+            # Refresh token before making request (no-op until near expiry)
             refresh_token()
             
-            # Build the request with full conversation history
-            input_items = build_conversation_input(conversation_history, user_input)
+            # Add the new user message to the conversation history
+            input_items.append({"type": "message", "role": "user", "content": user_input})
             
             # Stream the response with current log level
-            response_text, response, tool_calls = stream_response(input_items, log_level=current_log_level)
+            try:
+                response_text, response, tool_calls = await stream_response(input_items, log_level=current_log_level)
+            except Exception:
+                # Drop the unanswered message so history only holds completed turns
+                input_items.pop()
+                raise
             
             # Track tools used
-            total_tool_calls.extend(tool_calls)
+            total_tool_calls.update(tc['name'] for tc in tool_calls)
             
-            # Store in conversation history for multi-turn context
-            conversation_history.append({"role": "user", "content": user_input})
+            # Store the reply for multi-turn context
             if response_text:
-                conversation_history.append({"role": "assistant", "content": response_text})
+                input_items.append({"type": "message", "role": "assistant", "content": response_text})
+            trim_history(input_items)
             
-        except KeyboardInterrupt:
+        except (KeyboardInterrupt, EOFError, asyncio.CancelledError):
+            # Ctrl+C mid-stream cancels the main task instead of raising KeyboardInterrupt
+            # (Ctrl+D at the prompt raises EOFError)
             print("\n\nExiting... Goodbye!")
             if total_tool_calls:
-                print(f"📊 Session summary: {len(total_tool_calls)} tool call(s) made")
+                print(f"📊 Session summary: {total_tool_calls.total()} tool call(s) made")
             sys.exit(0)
         except Exception as e:
             print(f"\n❌ Error: {e}\n")
             # If authentication error, try refreshing token
             if "401" in str(e) or "unauthorized" in str(e).lower():
                 print("Attempting to refresh authentication...")
-                refresh_token()
+                refresh_token(force=True)
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        # Ctrl+C outside main() (e.g. while the event loop is waiting on the network)
+        print("\n\nExiting... Goodbye!")
@@ -21,7 +21,8 @@ Key Differences from Project-Based Access (foundry-agent-app.py):
 
 Authentication:
 ---------------
-Uses Azure DefaultAzureCredential with get_bearer_token_provider.
+Uses Azure DefaultAzureCredential. The bearer token is cached and only
+re-acquired when it is within 5 minutes of expiry.
 The caller must have the Azure AI User role on the Agent Application resource.
 
 Multi-Turn Conversations:
@@ -43,10 +44,22 @@ Type 'new' to start a new conversation.
 
 import os
 import sys
+import time
+import threading
+from functools import lru_cache
 from pathlib import Path
 from dotenv import load_dotenv
-from openai import OpenAI
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
+
+# Line editing and history for the input() prompts (stdlib on Linux/macOS;
+# on Windows, installing pyreadline3 provides the same module)
+try:
+    import readline  # noqa: F401
+except ImportError:
+    readline = None
+
+import httpx
+from openai import OpenAI, DefaultHttpxClient
+from azure.identity import DefaultAzureCredential
 
 # Load environment variables from project root
 # Navigate up from clients/published/ to find .env
@@ -64,6 +77,10 @@ APP_ENDPOINT = os.environ.get(
     "https://sansri-aihub-foundryiq-resource.services.ai.azure.com/api/projects/sansri-aihub-foundryiq/applications/FoundryIQ-Contoso-Agent/protocols/openai"
 )
 
+# Maximum number of history messages (user + assistant) sent with each request
+# Older turns are dropped once the limit is reached; 0 keeps the full history
+MAX_HISTORY_MESSAGES = int(os.environ.get("MAX_HISTORY_MESSAGES", "40"))
+
 print("Initializing Foundry Application Client...")
 print(f"Endpoint: {APP_ENDPOINT}")
 
@@ -71,28 +88,89 @@ print(f"Endpoint: {APP_ENDPOINT}")
 # AUTHENTICATION
 # =============================================================================
 
-# Create a token provider for Azure AI authentication
+# Azure AD credential and token scope for authentication
 # Requires Azure AI User role on the Agent Application resource
-token_provider = get_bearer_token_provider(
-    DefaultAzureCredential(),
-    "https://ai.azure.com/.default"
+credential = DefaultAzureCredential()
+TOKEN_SCOPE = "https://ai.azure.com/.default"
+
+# Refresh the cached token when it is this close to expiring
+TOKEN_REFRESH_MARGIN_SECONDS = 300
+
+# Cached bearer token (reused across turns until near expiry)
+_token_cache = {"token": None, "expires_on": 0}
+
+
+def get_token(force=False):
+    """Return a cached bearer token, acquiring a new one only when near expiry."""
+    if force or time.time() > _token_cache["expires_on"] - TOKEN_REFRESH_MARGIN_SECONDS:
+        access_token = credential.get_token(TOKEN_SCOPE)
+        _token_cache.update(token=access_token.token, expires_on=access_token.expires_on)
+    return _token_cache["token"]
+
+
+# Shared HTTP client with a tuned keep-alive pool
+# Follow-up requests reuse the same TLS connection instead of reconnecting
+# HTTP/2 is negotiated via ALPN (falls back to HTTP/1.1 if unsupported)
+http_client = DefaultHttpxClient(
+    transport=httpx.HTTPTransport(
+        http2=True,
+        retries=3,
+        limits=httpx.Limits(
+            max_keepalive_connections=32,
+            max_connections=64,
+            keepalive_expiry=120,
+        ),
+    ),
 )
 
+
+@lru_cache(maxsize=None)
+def get_client(endpoint):
+    """
+    Return the OpenAI client for a published application endpoint.
+    
+    Built once per endpoint and reused for the life of the process, sharing
+    the module credential, cached token and pooled http_client.
+    """
+    return OpenAI(
+        api_key=get_token(),
+        base_url=endpoint,
+        default_query={"api-version": "2025-11-15-preview"},
+        http_client=http_client,
+    )
+
+
 # Initialize OpenAI client with Azure credentials
-# Note: api_key is set to the token provider (callable that returns token)
-client = OpenAI(
-    api_key=token_provider(),  # Get initial token
-    base_url=APP_ENDPOINT,
-    default_query={"api-version": "2025-11-15-preview"}
-)
+# Note: api_key is a bearer token string, refreshed via refresh_token()
+client = get_client(APP_ENDPOINT)
 
 print("Connected to Agent Application")
 
 
-def refresh_token():
-    """Refresh the authentication token if needed."""
-    global client
-    client.api_key = token_provider()
+def warm_up_connection():
+    """
+    Open the pooled TLS connection before the first question is sent.
+    
+    A bare HEAD on the endpoint goes through the same pooled http_client, so
+    only the TCP/TLS handshake is paid: no token is sent, no API call is
+    made and the agent never runs. Any reply (typically an error status)
+    leaves a warm connection in the pool, so failures are ignored.
+    """
+    try:
+        http_client.head(APP_ENDPOINT, timeout=10)
+    except Exception:
+        pass
+
+
+# Warm up in the background while the user reads the banner
+threading.Thread(target=warm_up_connection, daemon=True).start()
+
+
+def refresh_token(force=False):
+    """Refresh the authentication token if it is close to expiring (or if forced)."""
+    token = get_token(force=force)
+    if client.api_key != token:
+        client.api_key = token
 
 
 def process_response_with_mcp_approval(response):
@@ -113,21 +191,21 @@ def process_response_with_mcp_approval(response):
     Returns:
         The response (may be incomplete if MCP approval is required)
     """
-    if hasattr(response, 'output'):
-        approval_requests = [
-            item for item in response.output 
-            if hasattr(item, 'type') and item.type == "mcp_approval_request"
-        ]
-        
-        if approval_requests:
-            print("\n⚠️  MCP Approval Required but NOT SUPPORTED for Published Apps!")
-            print("   Published Agent Applications are stateless and cannot process")
-            print("   MCP approval flows (previous_response_id not supported).")
-            print("\n   To fix this:")
-            print("   1. Reconfigure your agent's MCP tools with require_approval='never'")
-            print("   2. Or use foundry-agent-app.py for the unpublished agent\n")
-            for req in approval_requests:
-                print(f"   Pending approval: {req.id}")
+    # One pass over the output, one attribute lookup per item
+    approval_requests = [
+        item for item in (getattr(response, 'output', None) or ())
+        if getattr(item, 'type', None) == "mcp_approval_request"
+    ]
+    
+    if approval_requests:
+        print("\n⚠️  MCP Approval Required but NOT SUPPORTED for Published Apps!")
+        print("   Published Agent Applications are stateless and cannot process")
+        print("   MCP approval flows (previous_response_id not supported).")
+        print("\n   To fix this:")
+        print("   1. Reconfigure your agent's MCP tools with require_approval='never'")
+        print("   2. Or use foundry-agent-app.py for the unpublished agent\n")
+        for req in approval_requests:
+            print(f"   Pending approval: {req.id}")
     
     return response
 
@@ -139,31 +217,35 @@ def build_conversation_input(history, new_message):
     Since the application doesn't store conversation history server-side,
     we need to send the full conversation history with each request.
     
+    The history is already stored in request input format, so prior turns
+    are reused as-is and only the new user message is added.
+    
     Args:
-        history: List of previous messages in the conversation
+        history: List of previous message items in the conversation
         new_message: The new user message to add
     
     Returns:
         List of message items for the input parameter
     """
-    messages = []
-    
-    # Add previous conversation history
-    for msg in history:
-        messages.append({
-            "type": "message",
-            "role": msg["role"],
-            "content": msg["content"]
-        })
+    return history + [{"type": "message", "role": "user", "content": new_message}]
+
+
+def trim_history(history):
+    """
+    Drop the oldest turns once the history exceeds MAX_HISTORY_MESSAGES.
     
-    # Add the new user message
-    messages.append({
-        "type": "message",
-        "role": "user",
-        "content": new_message
-    })
+    Published applications are stateless, so the whole history is sent (and
+    billed as input tokens) on every request. Trimming keeps that payload
+    bounded in long sessions. The history always restarts at a user message.
     
-    return messages
+    Args:
+        history: Conversation items in request input format (modified in place)
+    """
+    if MAX_HISTORY_MESSAGES and len(history) > MAX_HISTORY_MESSAGES:
+        del history[:len(history) - MAX_HISTORY_MESSAGES]
+        # Never start the context with an orphaned assistant reply
+        while history and history[0]["role"] != "user":
+            del history[0]
 
 
 def main():
@@ -177,7 +259,7 @@ def main():
     print("Type 'new' to start a new conversation.")
     print("Press Ctrl+C to exit.\n")
     
-    # Maintain conversation history locally
+    # Maintain conversation history locally, already in request input format
     # Published applications are stateless - no server-side history
     conversation_history = []
     
@@ -196,7 +278,7 @@ def main():
                 print("Started new conversation!\n")
                 continue
             
-            # Refresh token before making request (tokens can expire)
+            # Refresh token before making request (no-op until near expiry)
             refresh_token()
             
             # Build the request with full conversation history
@@ -210,16 +292,25 @@ def main():
             # Check for MCP approval requests (not supported in published apps)
             response = process_response_with_mcp_approval(response)
             
-            # Store in conversation history for multi-turn context
-            conversation_history.append({"role": "user", "content": user_input})
-            if response.output_text:
-                conversation_history.append({"role": "assistant", "content": response.output_text})
+            # output_text is a property that re-joins the output on every access
+            output_text = response.output_text
             
-            # Print the response
-            if response.output_text:
-                print(f"\nAssistant: {response.output_text}\n")
+            # Store in conversation history for multi-turn context
+            # (input_items[-1] is the user message item, already in wire format)
+            if output_text:
+                conversation_history.extend((
+                    input_items[-1],
+                    {"type": "message", "role": "assistant", "content": output_text},
+                ))
             else:
-                print("\nAssistant: (No response - may require MCP approval)\n")
+                conversation_history.append(input_items[-1])
+            trim_history(conversation_history)
+            
+            # Print the response (one write for the whole reply)
+            sys.stdout.write(
+                f"\nAssistant: {output_text or '(No response - may require MCP approval)'}\n\n"
+            )
+            sys.stdout.flush()
             
         except KeyboardInterrupt:
             print("\n\nExiting... Goodbye!")
@@ -229,7 +320,7 @@ def main():
             # If authentication error, try refreshing token
             if "401" in str(e) or "unauthorized" in str(e).lower():
                 print("Attempting to refresh authentication...")
-                refresh_token()
+                refresh_token(force=True)
 
 
 if __name__ == "__main__":
@@ -24,12 +24,21 @@ Usage:
 """
 
 import os
+import re
 import sys
-import json
+import time
+import signal
+import asyncio
+from functools import lru_cache
 from pathlib import Path
 from dotenv import load_dotenv
-from openai import OpenAI
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
+
+# Line editing and history for the input() prompts (stdlib on Linux/macOS;
+# on Windows, installing pyreadline3 provides the same module)
+try:
+    import readline  # noqa: F401
+except ImportError:
+    readline = None
 
 # Load environment variables from project root
 project_root = Path(__file__).resolve().parent.parent.parent
@@ -45,86 +54,279 @@ if not APP_ENDPOINT:
     print("Error: AZURE_AI_FOUNDRY_STRUCTURED_OUTPUT_APP_ENDPOINT not set in .env")
     sys.exit(1)
 
+# Number of test questions sent to the agent at the same time
+MAX_CONCURRENT_REQUESTS = 4
+
+# Input history for --interactive (used when prompt_toolkit is installed)
+INPUT_HISTORY_FILE = project_root / ".foundry_history"
+
+# SDK imports come after the endpoint check so a misconfigured run exits
+# without paying for importing openai/httpx (azure.identity is imported on
+# first use, see get_credential)
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from pydantic import BaseModel, ValidationError
+
+# json5 is optional - last-resort parser for JSON with trailing commas,
+# single quotes or comments
+try:
+    import json5
+except ImportError:
+    json5 = None
+
+# prompt_toolkit is optional - async prompt with persistent input history
+# for --interactive (falls back to input() when it is not installed)
+try:
+    from prompt_toolkit import PromptSession
+    from prompt_toolkit.history import FileHistory
+except ImportError:
+    PromptSession = None
+
 print("=" * 70)
 print("Structured Output Agent - Client Test")
 print("=" * 70)
 print(f"Endpoint: {APP_ENDPOINT}")
 print()
 
+# =============================================================================
+# RESPONSE SCHEMA
+# =============================================================================
+
+class StructuredAnswer(BaseModel):
+    """The JSON object the structured output agent is configured to return."""
+    question: str
+    response: str
+
+
+# Outermost {...} block, for responses wrapped in markdown fences or commentary
+JSON_OBJECT_PATTERN = re.compile(r"\{.*\}", re.DOTALL)
+
+
+def extract_structured_answer(text: str):
+    """
+    Salvage a StructuredAnswer from text that is not a bare JSON object.
+    
+    Tries the outermost {...} block with the strict parser first, then with
+    json5 (if installed). Only used after strict parsing of the whole text
+    failed, so the normal path never pays for the fallbacks.
+    
+    Returns:
+        The StructuredAnswer, or None if nothing valid could be extracted
+    """
+    match = JSON_OBJECT_PATTERN.search(text)
+    if not match:
+        return None
+    candidate = match.group(0)
+    try:
+        return StructuredAnswer.model_validate_json(candidate)
+    except ValidationError:
+        pass
+    if json5 is not None:
+        try:
+            return StructuredAnswer.model_validate(json5.loads(candidate))
+        except (ValueError, ValidationError):
+            pass
+    return None
+
+
 # =============================================================================
 # AUTHENTICATION
 # =============================================================================
 
-print("Authenticating...")
-token_provider = get_bearer_token_provider(
-    DefaultAzureCredential(),
-    "https://ai.azure.com/.default"
-)
+TOKEN_SCOPE = "https://ai.azure.com/.default"
+
+# Refresh the cached token when it is this close to expiring
+TOKEN_REFRESH_MARGIN_SECONDS = 300
 
-client = OpenAI(
-    api_key=token_provider(),
-    base_url=APP_ENDPOINT,
-    default_query={"api-version": "2025-11-15-preview"}
+# Cached bearer token (reused across turns until near expiry)
+_token_cache = {"token": None, "expires_on": 0}
+
+
+@lru_cache(maxsize=None)
+def get_credential():
+    """
+    Return the Azure credential, importing azure.identity and building it on first use.
+    
+    Only the VS Code sign-in and interactive browser sources are excluded, so
+    the credential chain doesn't probe them before reaching environment /
+    managed identity / shared token cache / Azure CLI.
+    """
+    from azure.identity import DefaultAzureCredential
+    
+    print("Authenticating...")
+    return DefaultAzureCredential(
+        exclude_visual_studio_code_credential=True,
+        exclude_interactive_browser_credential=True,
+        exclude_shared_token_cache_credential=False,
+    )
+
+
+def get_token(force=False):
+    """Return a cached bearer token, acquiring a new one only when near expiry."""
+    if force or time.time() > _token_cache["expires_on"] - TOKEN_REFRESH_MARGIN_SECONDS:
+        access_token = get_credential().get_token(TOKEN_SCOPE)
+        _token_cache.update(token=access_token.token, expires_on=access_token.expires_on)
+    return _token_cache["token"]
+
+
+class CachedTokenAuth(httpx.Auth):
+    """
+    httpx auth hook that sets the cached bearer token on every request.
+    
+    The token is re-acquired only when it is close to expiry (see get_token),
+    so callers never refresh it themselves and a stale api_key is never sent.
+    """
+    
+    def auth_flow(self, request):
+        request.headers["Authorization"] = f"Bearer {get_token()}"
+        yield request
+
+
+# Shared HTTP client with a tuned keep-alive pool
+# Follow-up requests reuse the same TLS connection instead of reconnecting
+# HTTP/2 is negotiated via ALPN (falls back to HTTP/1.1 if unsupported)
+http_client = DefaultAsyncHttpxClient(
+    auth=CachedTokenAuth(),
+    transport=httpx.AsyncHTTPTransport(
+        http2=True,
+        retries=3,
+        limits=httpx.Limits(
+            max_keepalive_connections=32,
+            max_connections=64,
+            keepalive_expiry=120,
+        ),
+    ),
 )
-print("✅ Connected to Agent Application\n")
 
 
-def refresh_token():
-    """Refresh the authentication token."""
-    global client
-    client.api_key = token_provider()
+@lru_cache(maxsize=None)
+def get_client(endpoint):
+    """
+    Return the async OpenAI client for a published application endpoint.
+    
+    Built on first use and reused for the life of the process, sharing
+    the credential, cached token and pooled http_client. The api_key
+    is only the initial value; CachedTokenAuth keeps the header current.
+    """
+    client = AsyncOpenAI(
+        api_key=get_token(),
+        base_url=endpoint,
+        default_query={"api-version": "2025-11-15-preview"},
+        http_client=http_client,
+        # Concurrent test runs can hit rate limits; the SDK backs off and
+        # retries 429s (honouring Retry-After) up to this many times
+        max_retries=5,
+    )
+    print("✅ Connected to Agent Application\n")
+    return client
 
 
-def test_structured_output(question: str) -> dict:
+async def ask_agent(question: str, echo: bool = False) -> str:
     """
-    Send a question to the structured output agent and verify the response format.
+    Send a question to the structured output agent.
     
     Args:
         question: The question to ask the agent
+        echo: Stream the response and print it as it arrives
         
     Returns:
-        The parsed JSON response, or None if parsing failed
+        The raw output text of the response
     """
-    print(f"📤 Sending: {question}")
-    print("-" * 50)
+    input_items = [{
+        "type": "message",
+        "role": "user",
+        "content": question
+    }]
+    client = get_client(APP_ENDPOINT)
     
-    refresh_token()
+    if not echo:
+        response = await client.responses.create(input=input_items)
+        return response.output_text
     
-    response = client.responses.create(
-        input=[{
-            "type": "message",
-            "role": "user",
-            "content": question
-        }]
-    )
+    # Print tokens as they arrive; the JSON is validated once it is complete
+    stream = await client.responses.create(input=input_items, stream=True)
+    text_parts = []
+    print("📥 Raw response:")
+    async with stream:
+        async for event in stream:
+            if event.type == "response.output_text.delta":
+                text_parts.append(event.delta)
+                print(event.delta, end="", flush=True)
+            elif event.type == "error":
+                raise RuntimeError(f"Stream error: {event.message}")
+    print()
+    return "".join(text_parts)
+
+
+def truncate(text: str, limit: int) -> str:
+    """Return text cut to limit characters, with "..." appended if it was cut."""
+    return text if len(text) <= limit else f"{text[:limit]}..."
+
+
+def print_answer(answer):
+    """Print the fields of a StructuredAnswer, truncated for display."""
+    print(f"   question: {truncate(answer.question, 50)}")
+    print(f"   response: {truncate(answer.response, 100)}")
+
+
+def check_structured_output(raw_output: str, show_raw: bool = True):
+    """
+    Print a raw agent response and verify it has the structured output format.
     
-    raw_output = response.output_text
-    print(f"📥 Raw response:\n{raw_output}")
+    Args:
+        raw_output: The raw output text returned by the agent
+        show_raw: Print the raw text first (off when it was already streamed)
+        
+    Returns:
+        The validated StructuredAnswer, or None if the response is not valid
+    """
+    if show_raw:
+        print(f"📥 Raw response:\n{raw_output}")
     print("-" * 50)
     
-    # Try to parse as JSON
+    # Parse and validate in one pass (pydantic-core's JSON parser)
     try:
-        parsed = json.loads(raw_output)
-        
-        # Validate structure
-        if "question" in parsed and "response" in parsed:
-            print("✅ Valid structured output!")
-            print(f"   question: {parsed['question'][:50]}..." if len(parsed.get('question', '')) > 50 else f"   question: {parsed.get('question')}")
-            print(f"   response: {parsed['response'][:100]}..." if len(parsed.get('response', '')) > 100 else f"   response: {parsed.get('response')}")
-            return parsed
+        answer = StructuredAnswer.model_validate_json(raw_output)
+    except ValidationError as e:
+        errors = e.errors()
+        if any(err["type"] == "json_invalid" for err in errors):
+            answer = extract_structured_answer(raw_output)
+            if answer is not None:
+                print("⚠️  Response is not bare JSON - recovered the JSON object from it")
+                print_answer(answer)
+                return answer
+            print(f"❌ Response is NOT valid JSON!")
+            print(f"   Error: {errors[0]['msg']}")
         else:
             print("⚠️  JSON parsed but missing expected fields!")
             print(f"   Expected: 'question' and 'response'")
-            print(f"   Got: {list(parsed.keys())}")
-            return parsed
-            
-    except json.JSONDecodeError as e:
-        print(f"❌ Response is NOT valid JSON!")
-        print(f"   Error: {e}")
+            for err in errors:
+                print(f"   {'.'.join(str(loc) for loc in err['loc']) or '(root)'}: {err['msg']}")
         return None
+    
+    print("✅ Valid structured output!")
+    print_answer(answer)
+    return answer
 
 
-def run_tests():
+async def test_structured_output(question: str):
+    """
+    Send a question to the structured output agent and verify the response format.
+    
+    Args:
+        question: The question to ask the agent
+        
+    Returns:
+        The validated StructuredAnswer, or None if the response is not valid
+    """
+    print(f"📤 Sending: {question}")
+    print("-" * 50)
+    
+    raw_output = await ask_agent(question, echo=True)
+    return check_structured_output(raw_output, show_raw=False)
+
+
+async def run_tests():
     """Run a series of tests to verify structured output."""
     
     test_questions = [
@@ -145,25 +347,41 @@ def run_tests():
     print()
     print("=" * 70)
     
+    # The questions are independent, so send them all at once (bounded by
+    # MAX_CONCURRENT_REQUESTS) and report the results in order afterwards
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    
+    async def ask_limited(question):
+        async with semaphore:
+            return await ask_agent(question)
+    
+    print(f"\n📤 Sending {len(test_questions)} questions concurrently...")
+    raw_outputs = await asyncio.gather(
+        *(ask_limited(question) for question in test_questions),
+        return_exceptions=True,
+    )
+    
     results = {"passed": 0, "failed": 0}
     
-    for i, question in enumerate(test_questions, 1):
+    for i, (question, raw_output) in enumerate(zip(test_questions, raw_outputs), 1):
         print(f"\n📋 TEST {i}/{len(test_questions)}")
         print("=" * 50)
+        print(f"📤 Question: {question}")
+        print("-" * 50)
         
-        try:
-            result = test_structured_output(question)
-            
-            if result and "question" in result and "response" in result:
-                results["passed"] += 1
-                print("✅ TEST PASSED\n")
-            else:
-                results["failed"] += 1
-                print("❌ TEST FAILED\n")
-                
-        except Exception as e:
+        if isinstance(raw_output, BaseException):
+            results["failed"] += 1
+            print(f"❌ TEST FAILED - Error: {raw_output}\n")
+            continue
+        
+        result = check_structured_output(raw_output)
+        
+        if result is not None:
+            results["passed"] += 1
+            print("✅ TEST PASSED\n")
+        else:
             results["failed"] += 1
-            print(f"❌ TEST FAILED - Error: {e}\n")
+            print("❌ TEST FAILED\n")
     
     # Summary
     print("\n" + "=" * 70)
@@ -180,9 +398,31 @@ def run_tests():
     print("=" * 70)
 
 
-def interactive_mode():
+async def read_input(session, message):
+    """
+    Prompt for a line of input, awaiting it when prompt_toolkit is installed.
+    
+    Without prompt_toolkit, input() blocks the event loop (nothing else runs
+    while waiting at the prompt). asyncio.run's SIGINT handler would only
+    cancel the main task, which input() doesn't notice until Enter, so the
+    default handler is restored while it waits: Ctrl+C raises
+    KeyboardInterrupt at once and exits.
+    """
+    if session is not None:
+        return await session.prompt_async(message)
+    
+    previous_handler = signal.signal(signal.SIGINT, signal.default_int_handler)
+    try:
+        return input(message)
+    finally:
+        signal.signal(signal.SIGINT, previous_handler)
+
+
+async def interactive_mode():
     """Interactive mode for testing custom questions."""
     
+    session = PromptSession(history=FileHistory(str(INPUT_HISTORY_FILE))) if PromptSession else None
+    
     print("\n" + "=" * 70)
     print("INTERACTIVE MODE")
     print("=" * 70)
@@ -192,7 +432,7 @@ def interactive_mode():
     
     while True:
         try:
-            question = input("❓ Your question: ").strip()
+            question = (await read_input(session, "❓ Your question: ")).strip()
             
             if not question:
                 continue
@@ -202,28 +442,30 @@ def interactive_mode():
                 break
                 
             print()
-            test_structured_output(question)
+            await test_structured_output(question)
             print()
             
-        except KeyboardInterrupt:
+        except (KeyboardInterrupt, EOFError, asyncio.CancelledError):
+            # Ctrl+C while waiting for a response cancels the main task
+            # (Ctrl+D at the prompt raises EOFError)
             print("\n\nGoodbye!")
             break
         except Exception as e:
             print(f"\n❌ Error: {e}\n")
 
 
-def main():
+async def main():
     """Main entry point."""
-    import sys
-    
+    # The credential and client are created by the first request, so nothing
+    # is authenticated until a question is actually sent
     if len(sys.argv) > 1 and sys.argv[1] == "--interactive":
-        interactive_mode()
+        await interactive_mode()
     else:
-        run_tests()
+        await run_tests()
         
         print("\nTip: Run with --interactive for custom questions:")
         print("  python clients/published/structured-output-client.py --interactive")
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
@@ -10,6 +10,9 @@ Usage:
     # Interactive mode (prompts for all values)
     python ops/create-agent.py
 
+    # Interactive mode, filling in all values at once in $EDITOR
+    python ops/create-agent.py --edit
+
     # Non-interactive mode (uses defaults from .env)
     python ops/create-agent.py --non-interactive
 
@@ -29,6 +32,9 @@ Optional Environment Variables:
     - AZURE_AI_SEARCH_KB_MCP_ENDPOINT: Knowledge Base MCP endpoint URL
     - AZURE_AI_SEARCH_KB_CONNECTION_NAME: Project connection name for KB auth
     - AZURE_AI_SEARCH_KB_SERVER_LABEL: Server label for the MCP tool
+    - FOUNDRY_CREDENTIAL_CHAIN: "cli" (env + Azure CLI) | "managed" | "default" (full chain)
+      (unset: "managed" when IDENTITY_ENDPOINT is set, otherwise "cli")
+    - AZURE_SKIP_DOTENV: Set to skip loading .env (environment already provided)
 
 Prerequisites:
     - Azure CLI authenticated (az login)
@@ -36,28 +42,40 @@ Prerequisites:
 """
 
 import os
+import re
 import sys
+import json
+import shlex
 import argparse
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, fields
+from functools import lru_cache
 from pathlib import Path
 from dotenv import load_dotenv
-from azure.identity import DefaultAzureCredential
-from azure.ai.projects import AIProjectClient
-from azure.ai.projects.models import PromptAgentDefinition, MCPTool
+
+# The Azure SDK is imported on first use (see get_project_client), so --help
+# and configuration errors don't pay for importing it
 
 # Load environment variables from project root
 # Navigate up from ops/ to find .env
+# (pipelines that inject the environment can set AZURE_SKIP_DOTENV=1)
 project_root = Path(__file__).resolve().parent.parent
-load_dotenv(project_root / ".env")
+if not os.environ.get("AZURE_SKIP_DOTENV"):
+    load_dotenv(project_root / ".env")
 
 # =============================================================================
 # CONFIGURATION
 # =============================================================================
 
 PROJECT_ENDPOINT = os.environ.get("AZURE_AI_FOUNDRY_PROJECT_ENDPOINT")
+AGENT_NAME = os.environ.get("AZURE_AI_FOUNDRY_AGENT_NAME")
 MODEL_NAME = os.environ.get("AZURE_AI_FOUNDRY_MODEL_DEPLOYMENT_NAME", "gpt-4.1-mini")
 
 # MCP Configuration (from .env)
-MCP_REQUIRE_APPROVAL = os.environ.get("AZURE_AI_MCP_REQUIRE_APPROVAL", "never")
+# Normalized once so "Never" / " always " in .env are accepted
+MCP_REQUIRE_APPROVAL = os.environ.get("AZURE_AI_MCP_REQUIRE_APPROVAL", "never").strip().lower()
 MCP_ENDPOINT = os.environ.get("AZURE_AI_SEARCH_KB_MCP_ENDPOINT")
 MCP_CONNECTION_NAME = os.environ.get("AZURE_AI_SEARCH_KB_CONNECTION_NAME")
 MCP_SERVER_LABEL = os.environ.get("AZURE_AI_SEARCH_KB_SERVER_LABEL", "knowledge-base")
@@ -78,6 +96,14 @@ When answering questions:
 
 DEFAULT_INSTRUCTIONS = "You are a helpful assistant that answers questions accurately and concisely."
 
+# Agent names: letters, digits and hyphens, starting and ending with a letter
+# or digit, at most 63 characters. Checked locally so an invalid name fails
+# before the round-trip to Azure.
+AGENT_NAME_PATTERN = re.compile(r"^[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?$")
+
+# Characters that are converted to hyphens in agent names
+AGENT_NAME_FIXES = str.maketrans({"_": "-", " ": "-"})
+
 # =============================================================================
 # VALIDATION
 # =============================================================================
@@ -87,7 +113,8 @@ if not PROJECT_ENDPOINT:
     sys.exit(1)
 
 # Validate MCP approval setting
-if MCP_REQUIRE_APPROVAL not in ("never", "always"):
+VALID_MCP_REQUIRE_APPROVAL = frozenset({"never", "always"})
+if MCP_REQUIRE_APPROVAL not in VALID_MCP_REQUIRE_APPROVAL:
     print(f"Warning: AZURE_AI_MCP_REQUIRE_APPROVAL='{MCP_REQUIRE_APPROVAL}' is invalid.")
     print("         Valid values: 'never', 'always'. Defaulting to 'never'.")
     MCP_REQUIRE_APPROVAL = "never"
@@ -96,47 +123,143 @@ if MCP_REQUIRE_APPROVAL not in ("never", "always"):
 # INITIALIZE CLIENT
 # =============================================================================
 
-print("=" * 70)
-print("Azure AI Foundry - Create Agent")
-print("=" * 70)
-print(f"Project Endpoint: {PROJECT_ENDPOINT}")
-print(f"Model: {MODEL_NAME}")
-print(f"MCP require_approval: {MCP_REQUIRE_APPROVAL}")
-print()
-
-print("Connecting to Azure AI Foundry...")
-credential = DefaultAzureCredential()
-project_client = AIProjectClient(
-    endpoint=PROJECT_ENDPOINT,
-    credential=credential,
-)
-print("Connected!\n")
+print("\n".join((
+    "=" * 70,
+    "Azure AI Foundry - Create Agent",
+    "=" * 70,
+    f"Project Endpoint: {PROJECT_ENDPOINT}",
+    f"Model: {MODEL_NAME}",
+    f"MCP require_approval: {MCP_REQUIRE_APPROVAL}",
+    "",
+)))
+
+
+@lru_cache(maxsize=None)
+def create_credential():
+    """
+    Return the Azure credential used for authentication, created once per process.
+    
+    Only the credential the run can actually use is built (FOUNDRY_CREDENTIAL_CHAIN):
+      - "cli": environment variables (service principal) + Azure CLI login
+      - "managed": managed identity only (AZURE_CLIENT_ID selects a
+        user-assigned identity)
+      - "default": the full DefaultAzureCredential chain
+    When unset, "managed" is used on Azure-hosted runners that expose a
+    managed identity endpoint (IDENTITY_ENDPOINT) and configure no service
+    principal secret or federated token; "cli" is used everywhere else, so
+    the credential chain is never probed source by source.
+    """
+    from azure.identity import (
+        AzureCliCredential,
+        ChainedTokenCredential,
+        DefaultAzureCredential,
+        EnvironmentCredential,
+        ManagedIdentityCredential,
+    )
+    
+    chain = os.environ.get("FOUNDRY_CREDENTIAL_CHAIN", "").strip().lower()
+    if not chain:
+        # A service principal configured in the environment wins over the host's
+        # managed identity (AZURE_CLIENT_ID then names the app, not an identity)
+        has_service_principal = os.environ.get("AZURE_CLIENT_SECRET") or os.environ.get("AZURE_FEDERATED_TOKEN_FILE")
+        chain = "managed" if os.environ.get("IDENTITY_ENDPOINT") and not has_service_principal else "cli"
+    
+    if chain == "default":
+        return DefaultAzureCredential()
+    if chain == "managed":
+        return ManagedIdentityCredential(client_id=os.environ.get("AZURE_CLIENT_ID"))
+    return ChainedTokenCredential(EnvironmentCredential(), AzureCliCredential())
+
+
+@lru_cache(maxsize=None)
+def get_project_client():
+    """
+    Return the AIProjectClient, connecting on first use.
+    
+    Deferred until a command actually talks to Azure, so parsing arguments
+    (e.g. --help) doesn't import the Azure SDK or probe the credential chain.
+    """
+    from azure.ai.projects import AIProjectClient
+    
+    print("Connecting to Azure AI Foundry...")
+    project_client = AIProjectClient(
+        endpoint=PROJECT_ENDPOINT,
+        credential=create_credential(),
+    )
+    print("Connected!\n")
+    return project_client
+
 
 # =============================================================================
 # HELPER FUNCTIONS
 # =============================================================================
 
-def list_existing_agents():
-    """List existing agents for reference."""
+def truncate(text: str, limit: int) -> str:
+    """Return text cut to limit characters, with "..." appended if it was cut."""
+    return text if len(text) <= limit else f"{text[:limit]}..."
+
+
+def fetch_existing_resources(include_connections=True):
+    """
+    Start listing the project's agents (and optionally connections) in the background.
+    
+    Both are paginated REST calls, so running them on two threads takes
+    about as long as the slower one instead of both back to back. Returns
+    without waiting: each listing is only waited on when it is displayed.
+    Callers that may never show the connections (the wizard only does when
+    a Knowledge Base is added) pass include_connections=False, and the
+    listing is then made only if it is needed (see list_connections).
+    
+    Returns:
+        tuple: (agents_future, connections_future) - futures resolving to
+        the materialized lists (each raises on its own if its call failed);
+        connections_future is None when include_connections is False
+    """
+    # Connect before starting the threads so both share one client
+    project_client = get_project_client()
+    executor = ThreadPoolExecutor(max_workers=2)
+    agents_future = executor.submit(lambda: list(project_client.agents.list()))
+    connections_future = None
+    if include_connections:
+        connections_future = executor.submit(lambda: list(project_client.connections.list()))
+    executor.shutdown(wait=False)
+    return agents_future, connections_future
+
+
+def list_existing_agents(agents_future):
+    """
+    List existing agents for reference (from fetch_existing_resources).
+    
+    Returns:
+        frozenset of agent names, for the wizard's "already exists" check
+    """
     print("Existing agents in project:")
     try:
-        agents = list(project_client.agents.list())
+        agents = agents_future.result()
         if not agents:
             print("  (none)")
         for agent in agents:
             print(f"  - {agent.name}")
         print()
-        return [a.name for a in agents]
+        return frozenset(a.name for a in agents)
     except Exception as e:
         print(f"  Could not list agents: {e}\n")
-        return []
+        return frozenset()
 
 
-def list_connections():
-    """List project connections to find Knowledge Base MCP endpoints."""
+def list_connections(connections_future=None):
+    """
+    List project connections to find Knowledge Base MCP endpoints.
+    
+    Uses the listing started by fetch_existing_resources, or lists them now
+    when no future is given.
+    """
     print("Project connections:")
     try:
-        connections = list(project_client.connections.list())
+        if connections_future is not None:
+            connections = connections_future.result()
+        else:
+            connections = list(get_project_client().connections.list())
         mcp_connections = []
         
         for conn in connections:
@@ -163,12 +286,21 @@ def list_connections():
 
 
 def validate_agent_name(name: str) -> str:
-    """Validate and fix agent name (must use hyphens, not underscores)."""
-    if '_' in name:
-        fixed_name = name.replace('_', '-')
-        print(f"⚠️  Agent name contains underscores. Converting to: {fixed_name}")
-        return fixed_name
-    return name
+    """
+    Validate and fix agent name (must use hyphens, not underscores or spaces).
+    
+    Returns:
+        The (possibly fixed) agent name, or None if it is still invalid
+    """
+    fixed_name = name.translate(AGENT_NAME_FIXES)
+    if fixed_name != name:
+        print(f"⚠️  Agent name contains underscores or spaces. Converting to: {fixed_name}")
+    if not AGENT_NAME_PATTERN.match(fixed_name):
+        print(f"\n❌ Invalid agent name: {fixed_name!r}")
+        print("   Use letters, digits and hyphens (max 63 characters),")
+        print("   starting and ending with a letter or digit.")
+        return None
+    return fixed_name
 
 
 def create_agent(
@@ -199,8 +331,12 @@ def create_agent(
     print("Creating Agent")
     print("=" * 70)
     
+    from azure.ai.projects.models import PromptAgentDefinition, MCPTool
+    
     # Validate agent name
     agent_name = validate_agent_name(agent_name)
+    if agent_name is None:
+        return None
     
     # Build tools list
     tools = []
@@ -228,13 +364,12 @@ def create_agent(
     print(f"  Model: {MODEL_NAME}")
     print(f"  Tools: {len(tools)} configured")
     print(f"  Description: {description or '(default)'}")
-    instr_preview = instructions[:100] + "..." if len(instructions) > 100 else instructions
-    print(f"  Instructions: {instr_preview}")
+    print(f"  Instructions: {truncate(instructions, 100)}")
     
     # Create the agent
     print("\nCreating agent...")
     try:
-        agent = project_client.agents.create_version(
+        agent = get_project_client().agents.create_version(
             agent_name=agent_name,
             definition=PromptAgentDefinition(
                 model=MODEL_NAME,
@@ -273,16 +408,17 @@ def run_interactive():
     """Interactive wizard for creating an agent."""
     
     # Step 1: Show existing resources
+    # (connections are only listed in Step 3, if a Knowledge Base is added)
     print("Step 1: Checking existing resources\n")
-    existing_agents = list_existing_agents()
-    mcp_connections = list_connections()
+    agents_future, _ = fetch_existing_resources(include_connections=False)
+    existing_agents = list_existing_agents(agents_future)
     
     # Step 2: Get agent name
     print("-" * 70)
     print("Step 2: Agent Name")
     print("-" * 70)
     
-    default_name = os.environ.get("AZURE_AI_FOUNDRY_AGENT_NAME", "my-agent")
+    default_name = AGENT_NAME or "my-agent"
     agent_name = input(f"Enter agent name [{default_name}]: ").strip()
     if not agent_name:
         agent_name = default_name
@@ -302,8 +438,11 @@ def run_interactive():
     mcp_server_label = None
     
     if with_kb:
+        print()
+        list_connections()
+        
         # Get MCP endpoint
-        print("\nKnowledge Base MCP endpoint format:")
+        print("Knowledge Base MCP endpoint format:")
         print("  https://<search>.search.windows.net/knowledgebases/<kb>/mcp?api-version=2025-11-01-Preview")
         
         default_endpoint = MCP_ENDPOINT or ""
@@ -389,6 +528,109 @@ def run_interactive():
     )
 
 
+# =============================================================================
+# EDITOR MODE
+# =============================================================================
+
+@dataclass(slots=True)
+class AgentSpec:
+    """Agent settings filled in through the --edit template (empty = default)."""
+    name: str
+    with_kb: bool = False
+    mcp_endpoint: str = ""
+    mcp_connection: str = ""
+    mcp_server_label: str = ""
+    instructions: str = ""
+    description: str = ""
+
+
+def edit_agent_spec(spec: AgentSpec):
+    """
+    Open the spec as a JSON template in $EDITOR and read it back.
+    
+    Args:
+        spec: The pre-filled defaults
+    
+    Returns:
+        The edited AgentSpec, or None if the editor failed or the file is invalid
+    """
+    editor = os.environ.get("VISUAL") or os.environ.get("EDITOR") or (
+        "notepad" if sys.platform == "win32" else "vi"
+    )
+    
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False, encoding="utf-8") as f:
+        json.dump(asdict(spec), f, indent=2)
+        path = f.name
+    try:
+        if subprocess.run([*shlex.split(editor), path]).returncode != 0:
+            print(f"❌ Editor '{editor}' exited with an error. Cancelled.")
+            return None
+        with open(path, encoding="utf-8") as f:
+            edited = AgentSpec(**json.load(f))
+        # JSON accepts any type: reject e.g. "name": null or "with_kb": "false"
+        for spec_field in fields(AgentSpec):
+            expected = bool if spec_field.name == "with_kb" else str
+            if not isinstance(getattr(edited, spec_field.name), expected):
+                raise TypeError(
+                    f"'{spec_field.name}' must be {'true or false' if expected is bool else 'a string'}"
+                )
+        return edited
+    except (OSError, ValueError, TypeError) as e:
+        print(f"❌ Could not read the agent settings: {e}")
+        return None
+    finally:
+        os.unlink(path)
+
+
+def run_editor():
+    """Interactive mode that collects every setting in one editor session."""
+    
+    print("Checking existing resources\n")
+    agents_future, connections_future = fetch_existing_resources()
+    existing_agents = list_existing_agents(agents_future)
+    mcp_connections = list_connections(connections_future)
+    
+    spec = AgentSpec(
+        name=AGENT_NAME or "my-agent",
+        with_kb=bool(MCP_ENDPOINT),
+        mcp_endpoint=MCP_ENDPOINT or "",
+        mcp_connection=MCP_CONNECTION_NAME or (mcp_connections[0]['name'] if mcp_connections else ""),
+        mcp_server_label=MCP_SERVER_LABEL or "knowledge-base",
+    )
+    
+    print("Opening the agent settings in your editor...")
+    print("Leave instructions/description empty to use the defaults. Save and close to continue.")
+    spec = edit_agent_spec(spec)
+    if spec is None:
+        return
+    
+    with_kb = spec.with_kb and bool(spec.mcp_endpoint)
+    if spec.with_kb and not with_kb:
+        print("No MCP endpoint provided. Skipping KB configuration.")
+    instructions = spec.instructions or (DEFAULT_KB_INSTRUCTIONS if with_kb else DEFAULT_INSTRUCTIONS)
+    description = spec.description or (
+        f"Agent: {spec.name}" + (" with Knowledge Base" if with_kb else "")
+    )
+    
+    if spec.name in existing_agents:
+        print(f"⚠️  Agent '{spec.name}' exists. A new version will be created.")
+    
+    confirm = input(f"\nCreate agent '{spec.name}'? (y/n): ").strip().lower()
+    if confirm != 'y':
+        print("Cancelled.")
+        return
+    
+    create_agent(
+        agent_name=spec.name,
+        instructions=instructions,
+        description=description,
+        with_kb=with_kb,
+        mcp_endpoint=spec.mcp_endpoint if with_kb else None,
+        mcp_connection=spec.mcp_connection or None,
+        mcp_server_label=spec.mcp_server_label or None,
+    )
+
+
 # =============================================================================
 # NON-INTERACTIVE MODE
 # =============================================================================
@@ -396,7 +638,7 @@ def run_interactive():
 def run_non_interactive(args):
     """Non-interactive mode for CI/CD pipelines."""
     
-    agent_name = args.name or os.environ.get("AZURE_AI_FOUNDRY_AGENT_NAME")
+    agent_name = args.name or AGENT_NAME
     if not agent_name:
         print("Error: Agent name required. Use --name or set AZURE_AI_FOUNDRY_AGENT_NAME")
         sys.exit(1)
@@ -440,6 +682,9 @@ Examples:
     # Interactive mode
     python ops/create-agent.py
 
+    # Interactive mode with a single editor template
+    python ops/create-agent.py --edit
+
     # Non-interactive with env defaults
     python ops/create-agent.py --non-interactive --name my-agent
 
@@ -452,6 +697,11 @@ Examples:
         action="store_true",
         help="Run in non-interactive mode (uses env vars and defaults)"
     )
+    parser.add_argument(
+        "--edit", "-e",
+        action="store_true",
+        help="Fill in all agent settings at once in $EDITOR instead of step-by-step prompts"
+    )
     parser.add_argument(
         "--name",
         help="Agent name (default: AZURE_AI_FOUNDRY_AGENT_NAME env var)"
@@ -474,6 +724,8 @@ Examples:
     
     if args.non_interactive:
         run_non_interactive(args)
+    elif args.edit:
+        run_editor()
     else:
         run_interactive()
 
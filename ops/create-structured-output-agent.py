@@ -16,6 +16,11 @@ Required Environment Variables:
     - AZURE_AI_FOUNDRY_PROJECT_ENDPOINT: Project endpoint URL
     - AZURE_AI_FOUNDRY_MODEL_DEPLOYMENT_NAME: Model to use (e.g., gpt-4.1-mini)
 
+Optional Environment Variables:
+    - FOUNDRY_CREDENTIAL_CHAIN: "cli" (env + Azure CLI) | "managed" | "default" (full chain)
+      (unset: "managed" when IDENTITY_ENDPOINT is set, otherwise "cli")
+    - AZURE_SKIP_DOTENV: Set to skip loading .env (environment already provided)
+
 Prerequisites:
     - Azure CLI authenticated (az login)
     - Contributor role on the AI Foundry project
@@ -23,19 +28,19 @@ Prerequisites:
 
 import os
 import sys
+import json
+from functools import lru_cache
 from pathlib import Path
 from dotenv import load_dotenv
-from azure.identity import DefaultAzureCredential
-from azure.ai.projects import AIProjectClient
-from azure.ai.projects.models import (
-    PromptAgentDefinition,
-    PromptAgentDefinitionText,
-    ResponseTextFormatConfigurationJsonSchema,
-)
+
+# The Azure SDK is imported in main(), so configuration errors exit
+# without paying for importing it
 
 # Load environment variables from project root
+# (pipelines that inject the environment can set AZURE_SKIP_DOTENV=1)
 project_root = Path(__file__).resolve().parent.parent
-load_dotenv(project_root / ".env")
+if not os.environ.get("AZURE_SKIP_DOTENV"):
+    load_dotenv(project_root / ".env")
 
 # =============================================================================
 # CONFIGURATION
@@ -88,30 +93,75 @@ if not PROJECT_ENDPOINT:
 # MAIN
 # =============================================================================
 
+@lru_cache(maxsize=None)
+def create_credential():
+    """
+    Return the Azure credential used for authentication, created once per process.
+    
+    Only the credential the run can actually use is built (FOUNDRY_CREDENTIAL_CHAIN):
+      - "cli": environment variables (service principal) + Azure CLI login
+      - "managed": managed identity only (AZURE_CLIENT_ID selects a
+        user-assigned identity)
+      - "default": the full DefaultAzureCredential chain
+    When unset, "managed" is used on Azure-hosted runners that expose a
+    managed identity endpoint (IDENTITY_ENDPOINT) and configure no service
+    principal secret or federated token; "cli" is used everywhere else, so
+    the credential chain is never probed source by source.
+    """
+    from azure.identity import (
+        AzureCliCredential,
+        ChainedTokenCredential,
+        DefaultAzureCredential,
+        EnvironmentCredential,
+        ManagedIdentityCredential,
+    )
+    
+    chain = os.environ.get("FOUNDRY_CREDENTIAL_CHAIN", "").strip().lower()
+    if not chain:
+        # A service principal configured in the environment wins over the host's
+        # managed identity (AZURE_CLIENT_ID then names the app, not an identity)
+        has_service_principal = os.environ.get("AZURE_CLIENT_SECRET") or os.environ.get("AZURE_FEDERATED_TOKEN_FILE")
+        chain = "managed" if os.environ.get("IDENTITY_ENDPOINT") and not has_service_principal else "cli"
+    
+    if chain == "default":
+        return DefaultAzureCredential()
+    if chain == "managed":
+        return ManagedIdentityCredential(client_id=os.environ.get("AZURE_CLIENT_ID"))
+    return ChainedTokenCredential(EnvironmentCredential(), AzureCliCredential())
+
+
 def main():
-    print("=" * 70)
-    print("Azure AI Foundry - Create Structured Output Agent")
-    print("=" * 70)
-    print(f"Project Endpoint: {PROJECT_ENDPOINT}")
-    print(f"Model: {MODEL_NAME}")
-    print(f"Agent Name: {AGENT_NAME}")
-    print()
+    from azure.ai.projects import AIProjectClient
+    from azure.ai.projects.models import (
+        PromptAgentDefinition,
+        PromptAgentDefinitionText,
+        ResponseTextFormatConfigurationJsonSchema,
+    )
+    
+    print("\n".join((
+        "=" * 70,
+        "Azure AI Foundry - Create Structured Output Agent",
+        "=" * 70,
+        f"Project Endpoint: {PROJECT_ENDPOINT}",
+        f"Model: {MODEL_NAME}",
+        f"Agent Name: {AGENT_NAME}",
+        "",
+    )))
 
     # Connect to Azure AI Foundry
     print("Connecting to Azure AI Foundry...")
-    credential = DefaultAzureCredential()
     project_client = AIProjectClient(
         endpoint=PROJECT_ENDPOINT,
-        credential=credential,
+        credential=create_credential(),
     )
     print("✅ Connected!\n")
 
     # Check if agent already exists
+    # any() stops at the first match, so later pages are never fetched
     print("Checking for existing agents...")
-    existing_agents = list(project_client.agents.list())
-    existing_names = [a.name for a in existing_agents]
+    agent_exists = any(a.name == AGENT_NAME for a in project_client.agents.list())
     
-    if AGENT_NAME in existing_names:
+    if agent_exists:
         print(f"⚠️  Agent '{AGENT_NAME}' already exists.")
         response = input("Do you want to create a new version? (y/n): ").strip().lower()
         if response != 'y':
@@ -122,7 +172,7 @@ def main():
 
     # Create the structured output configuration
     print("Configuring structured JSON output...")
-    print(f"Schema: {RESPONSE_SCHEMA}")
+    print(f"Schema: {json.dumps(RESPONSE_SCHEMA, separators=(',', ':'))}")
     print()
 
     # Build the text format configuration with JSON schema
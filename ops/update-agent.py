@@ -16,6 +16,9 @@ Usage:
     # Non-interactive - update instructions
     python ops/update-agent.py --non-interactive --instructions "New instructions..."
 
+    # Non-interactive - update several agents at once
+    python ops/update-agent.py --non-interactive --name agent-a agent-b --update-mcp
+
 Features:
     - Updates existing agents while preserving configuration
     - Can update MCP require_approval setting from environment
@@ -33,6 +36,9 @@ Optional Environment Variables:
     - AZURE_AI_SEARCH_KB_MCP_ENDPOINT: Knowledge Base MCP endpoint URL
     - AZURE_AI_SEARCH_KB_CONNECTION_NAME: Project connection name for KB auth
     - AZURE_AI_SEARCH_KB_SERVER_LABEL: Server label for the MCP tool
+    - FOUNDRY_CREDENTIAL_CHAIN: "cli" (env + Azure CLI) | "managed" | "default" (full chain)
+      (unset: "managed" when IDENTITY_ENDPOINT is set, otherwise "cli")
+    - AZURE_SKIP_DOTENV: Set to skip loading .env (environment already provided)
 
 Prerequisites:
     - Azure CLI authenticated (az login)
@@ -40,19 +46,25 @@ Prerequisites:
     - Agent must already exist
 """
 
+import io
 import os
 import sys
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
 from dotenv import load_dotenv
-from azure.identity import DefaultAzureCredential
-from azure.ai.projects import AIProjectClient
-from azure.ai.projects.models import PromptAgentDefinition, MCPTool
+
+# The Azure SDK is imported on first use (see get_project_client), so --help
+# and configuration errors don't pay for importing it
 
 # Load environment variables from project root
 # Navigate up from ops/ to find .env
+# (pipelines that inject the environment can set AZURE_SKIP_DOTENV=1)
 project_root = Path(__file__).resolve().parent.parent
-load_dotenv(project_root / ".env")
+if not os.environ.get("AZURE_SKIP_DOTENV"):
+    load_dotenv(project_root / ".env")
 
 # =============================================================================
 # CONFIGURATION
@@ -63,11 +75,19 @@ AGENT_NAME = os.environ.get("AZURE_AI_FOUNDRY_AGENT_NAME")
 MODEL_NAME = os.environ.get("AZURE_AI_FOUNDRY_MODEL_DEPLOYMENT_NAME", "gpt-4.1-mini")
 
 # MCP Configuration (from .env)
-MCP_REQUIRE_APPROVAL = os.environ.get("AZURE_AI_MCP_REQUIRE_APPROVAL", "never")
+# Normalized once so "Never" / " always " in .env are accepted
+MCP_REQUIRE_APPROVAL = os.environ.get("AZURE_AI_MCP_REQUIRE_APPROVAL", "never").strip().lower()
 MCP_ENDPOINT = os.environ.get("AZURE_AI_SEARCH_KB_MCP_ENDPOINT")
 MCP_CONNECTION_NAME = os.environ.get("AZURE_AI_SEARCH_KB_CONNECTION_NAME")
 MCP_SERVER_LABEL = os.environ.get("AZURE_AI_SEARCH_KB_SERVER_LABEL", "knowledge-base")
 
+# Characters of the instructions shown in the configuration summary
+INSTRUCTIONS_PREVIEW_CHARS = 150
+
+# Agents updated at the same time when several names are given
+# (bounded so bulk updates stay under the service's rate limits)
+MAX_CONCURRENT_UPDATES = 8
+
 # =============================================================================
 # VALIDATION
 # =============================================================================
@@ -77,7 +97,8 @@ if not PROJECT_ENDPOINT:
     sys.exit(1)
 
 # Validate MCP approval setting
-if MCP_REQUIRE_APPROVAL not in ("never", "always"):
+VALID_MCP_REQUIRE_APPROVAL = frozenset({"never", "always"})
+if MCP_REQUIRE_APPROVAL not in VALID_MCP_REQUIRE_APPROVAL:
     print(f"Warning: AZURE_AI_MCP_REQUIRE_APPROVAL='{MCP_REQUIRE_APPROVAL}' is invalid.")
     print("         Valid values: 'never', 'always'. Defaulting to 'never'.")
     MCP_REQUIRE_APPROVAL = "never"
@@ -86,31 +107,87 @@ if MCP_REQUIRE_APPROVAL not in ("never", "always"):
 # INITIALIZE CLIENT
 # =============================================================================
 
-print("=" * 70)
-print("Azure AI Foundry - Update Agent")
-print("=" * 70)
-print(f"Project Endpoint: {PROJECT_ENDPOINT}")
-print(f"Default Agent: {AGENT_NAME or '(not set)'}")
-print(f"MCP require_approval: {MCP_REQUIRE_APPROVAL}")
-print()
-
-print("Connecting to Azure AI Foundry...")
-credential = DefaultAzureCredential()
-project_client = AIProjectClient(
-    endpoint=PROJECT_ENDPOINT,
-    credential=credential,
-)
-print("Connected!\n")
+print("\n".join((
+    "=" * 70,
+    "Azure AI Foundry - Update Agent",
+    "=" * 70,
+    f"Project Endpoint: {PROJECT_ENDPOINT}",
+    f"Default Agent: {AGENT_NAME or '(not set)'}",
+    f"MCP require_approval: {MCP_REQUIRE_APPROVAL}",
+    "",
+)))
+
+
+@lru_cache(maxsize=None)
+def create_credential():
+    """
+    Return the Azure credential used for authentication, created once per process.
+    
+    Only the credential the run can actually use is built (FOUNDRY_CREDENTIAL_CHAIN):
+      - "cli": environment variables (service principal) + Azure CLI login
+      - "managed": managed identity only (AZURE_CLIENT_ID selects a
+        user-assigned identity)
+      - "default": the full DefaultAzureCredential chain
+    When unset, "managed" is used on Azure-hosted runners that expose a
+    managed identity endpoint (IDENTITY_ENDPOINT) and configure no service
+    principal secret or federated token; "cli" is used everywhere else, so
+    the credential chain is never probed source by source.
+    """
+    from azure.identity import (
+        AzureCliCredential,
+        ChainedTokenCredential,
+        DefaultAzureCredential,
+        EnvironmentCredential,
+        ManagedIdentityCredential,
+    )
+    
+    chain = os.environ.get("FOUNDRY_CREDENTIAL_CHAIN", "").strip().lower()
+    if not chain:
+        # A service principal configured in the environment wins over the host's
+        # managed identity (AZURE_CLIENT_ID then names the app, not an identity)
+        has_service_principal = os.environ.get("AZURE_CLIENT_SECRET") or os.environ.get("AZURE_FEDERATED_TOKEN_FILE")
+        chain = "managed" if os.environ.get("IDENTITY_ENDPOINT") and not has_service_principal else "cli"
+    
+    if chain == "default":
+        return DefaultAzureCredential()
+    if chain == "managed":
+        return ManagedIdentityCredential(client_id=os.environ.get("AZURE_CLIENT_ID"))
+    return ChainedTokenCredential(EnvironmentCredential(), AzureCliCredential())
+
+
+@lru_cache(maxsize=None)
+def get_project_client():
+    """
+    Return the AIProjectClient, connecting on first use.
+    
+    Deferred until a command actually talks to Azure, so parsing arguments
+    (e.g. --help) doesn't import the Azure SDK or probe the credential chain.
+    """
+    from azure.ai.projects import AIProjectClient
+    
+    print("Connecting to Azure AI Foundry...")
+    project_client = AIProjectClient(
+        endpoint=PROJECT_ENDPOINT,
+        credential=create_credential(),
+    )
+    print("Connected!\n")
+    return project_client
+
 
 # =============================================================================
 # HELPER FUNCTIONS
 # =============================================================================
 
+def truncate(text: str, limit: int) -> str:
+    """Return text cut to limit characters, with "..." appended if it was cut."""
+    return text if len(text) <= limit else f"{text[:limit]}..."
+
+
 def list_agents():
     """List all agents in the project."""
     print("Available agents:")
     try:
-        agents = list(project_client.agents.list())
+        agents = list(get_project_client().agents.list())
         if not agents:
             print("  (none)")
             return []
@@ -123,83 +200,100 @@ def list_agents():
         return []
 
 
-def get_agent_details(agent_name: str):
-    """Get the current agent configuration."""
-    print(f"Fetching agent: {agent_name}")
+@dataclass(frozen=True, slots=True)
+class AgentSnapshot:
+    """The latest version of an agent, as read by get_agent_details."""
+    name: str
+    version: str
+    model: str
+    instructions: str
+    description: str
+    tools: tuple
+
+
+def get_agent_details(agent_name: str, out=None):
+    """
+    Get the current agent configuration.
+    
+    Args:
+        agent_name: Name of the agent
+        out: Stream for progress output (default: sys.stdout)
+    
+    Returns:
+        An AgentSnapshot of the latest version, or None if it could not be read
+    """
+    print(f"Fetching agent: {agent_name}", file=out)
     try:
-        versions = list(project_client.agents.list_versions(agent_name=agent_name))
-        if not versions:
-            print(f"  No versions found for agent '{agent_name}'")
+        # Keep only the latest version (the last one listed) while walking the
+        # pages, instead of holding the agent's whole version history
+        latest = None
+        version_count = 0
+        for latest in get_project_client().agents.list_versions(agent_name=agent_name):
+            version_count += 1
+        if latest is None:
+            print(f"  No versions found for agent '{agent_name}'", file=out)
             return None
         
-        latest = versions[-1]
         version = getattr(latest, 'version', 'N/A')
-        print(f"  Found {len(versions)} version(s), latest: {version}")
+        print(f"  Found {version_count} version(s), latest: {version}", file=out)
         
-        # Extract definition
-        definition = getattr(latest, 'definition', {})
+        # Extract definition (a plain dict or an SDK model, read the same way)
+        definition = getattr(latest, 'definition', None) or {}
         if isinstance(definition, dict):
-            model = definition.get('model', MODEL_NAME)
-            instructions = definition.get('instructions', '')
-            tools = definition.get('tools', [])
+            field = definition.get
         else:
-            model = getattr(definition, 'model', MODEL_NAME)
-            instructions = getattr(definition, 'instructions', '')
-            tools = getattr(definition, 'tools', [])
+            field = lambda key: getattr(definition, key, None)
         
-        return {
-            'name': agent_name,
-            'version': version,
-            'model': model,
-            'instructions': instructions,
-            'description': getattr(latest, 'description', ''),
-            'tools': tools,
-            'raw': latest,
-        }
+        return AgentSnapshot(
+            name=agent_name,
+            version=version,
+            model=field('model') or MODEL_NAME,
+            instructions=field('instructions') or '',
+            description=getattr(latest, 'description', None) or '',
+            tools=tuple(field('tools') or ()),
+        )
     except Exception as e:
-        print(f"  Error getting agent: {e}")
+        print(f"  Error getting agent: {e}", file=out)
         return None
 
 
-def display_agent_config(agent_info: dict):
-    """Display current agent configuration."""
-    print("\n" + "-" * 70)
-    print("Current Agent Configuration")
-    print("-" * 70)
-    print(f"  Name: {agent_info['name']}")
-    print(f"  Version: {agent_info['version']}")
-    print(f"  Model: {agent_info.get('model', 'N/A')}")
-    print(f"  Description: {agent_info.get('description', 'N/A')}")
-    
-    # Display instructions (truncated)
-    instructions = agent_info.get('instructions', '')
-    if len(instructions) > 150:
-        print(f"  Instructions: {instructions[:150]}...")
-    else:
-        print(f"  Instructions: {instructions}")
-    
-    # Display tools
-    tools = agent_info.get('tools', [])
+def display_agent_config(agent_info: AgentSnapshot, out=None):
+    """Display current agent configuration (collected and written in one print to out)."""
+    lines = [
+        "\n" + "-" * 70,
+        "Current Agent Configuration",
+        "-" * 70,
+        f"  Name: {agent_info.name}",
+        f"  Version: {agent_info.version}",
+        f"  Model: {agent_info.model or 'N/A'}",
+        f"  Description: {agent_info.description or 'N/A'}",
+        # Instructions (truncated)
+        f"  Instructions: {truncate(agent_info.instructions, INSTRUCTIONS_PREVIEW_CHARS)}",
+    ]
+    
+    # Tools
+    tools = agent_info.tools
     if tools:
-        print(f"  Tools: {len(tools)}")
+        lines.append(f"  Tools: {len(tools)}")
         for i, tool in enumerate(tools):
             if hasattr(tool, 'server_label'):
-                print(f"    [{i+1}] MCP: {tool.server_label}")
+                lines.append(f"    [{i+1}] MCP: {tool.server_label}")
                 if hasattr(tool, 'require_approval'):
-                    print(f"        require_approval: {tool.require_approval}")
+                    lines.append(f"        require_approval: {tool.require_approval}")
             elif isinstance(tool, dict):
                 if 'server_label' in tool:
-                    print(f"    [{i+1}] MCP: {tool.get('server_label')}")
-                    print(f"        require_approval: {tool.get('require_approval', 'N/A')}")
+                    lines.append(f"    [{i+1}] MCP: {tool.get('server_label')}")
+                    lines.append(f"        require_approval: {tool.get('require_approval', 'N/A')}")
                 else:
-                    print(f"    [{i+1}] {tool.get('type', 'unknown')}")
+                    lines.append(f"    [{i+1}] {tool.get('type', 'unknown')}")
     else:
-        print("  Tools: (none)")
-    print()
+        lines.append("  Tools: (none)")
+    lines.append("")
+    print("\n".join(lines), file=out)
 
 
 def update_agent(
-    agent_info: dict,
+    agent_info: AgentSnapshot,
     new_instructions: str = None,
     new_description: str = None,
     new_model: str = None,
@@ -207,12 +301,13 @@ def update_agent(
     mcp_endpoint: str = None,
     mcp_connection: str = None,
     mcp_server_label: str = None,
+    out=None,
 ):
     """
     Create a new agent version with updated configuration.
     
     Args:
-        agent_info: Current agent information
+        agent_info: AgentSnapshot of the current version (from get_agent_details)
         new_instructions: New instructions (None to keep current)
         new_description: New description (None to keep current)
         new_model: New model (None to keep current)
@@ -220,30 +315,33 @@ def update_agent(
         mcp_endpoint: MCP endpoint URL
         mcp_connection: MCP connection name
         mcp_server_label: MCP server label
+        out: Stream for progress output (default: sys.stdout)
     
     Returns:
         The updated agent object, or None on failure
     """
-    print("\n" + "=" * 70)
-    print("Updating Agent")
-    print("=" * 70)
+    from azure.ai.projects.models import PromptAgentDefinition, MCPTool
+    
+    print("\n" + "=" * 70, file=out)
+    print("Updating Agent", file=out)
+    print("=" * 70, file=out)
     
     # Determine final values
-    agent_name = agent_info['name']
-    model = new_model or agent_info.get('model', MODEL_NAME)
-    instructions = new_instructions or agent_info.get('instructions', '')
-    description = new_description or agent_info.get('description', '')
+    agent_name = agent_info.name
+    model = new_model or agent_info.model
+    instructions = new_instructions or agent_info.instructions
+    description = new_description or agent_info.description
     
     # Build tools list
     tools = []
     
     if update_mcp and mcp_endpoint:
-        print(f"\nUpdating MCP Tool Configuration:")
-        print(f"  Server Label: {mcp_server_label or MCP_SERVER_LABEL}")
-        print(f"  Server URL: {mcp_endpoint}")
-        print(f"  require_approval: {MCP_REQUIRE_APPROVAL}")
+        print(f"\nUpdating MCP Tool Configuration:", file=out)
+        print(f"  Server Label: {mcp_server_label or MCP_SERVER_LABEL}", file=out)
+        print(f"  Server URL: {mcp_endpoint}", file=out)
+        print(f"  require_approval: {MCP_REQUIRE_APPROVAL}", file=out)
         if mcp_connection:
-            print(f"  project_connection_id: {mcp_connection}")
+            print(f"  project_connection_id: {mcp_connection}", file=out)
         
         mcp_tool = MCPTool(
             server_label=mcp_server_label or MCP_SERVER_LABEL,
@@ -253,20 +351,20 @@ def update_agent(
             project_connection_id=mcp_connection if mcp_connection else None,
         )
         tools.append(mcp_tool)
-    elif agent_info.get('tools'):
+    elif agent_info.tools:
         # Keep existing tools (but we can't modify them without recreating)
-        print("\nNote: Keeping existing tool configuration.")
-        print("      Use --update-mcp to update MCP settings.")
+        print("\nNote: Keeping existing tool configuration.", file=out)
+        print("      Use --update-mcp to update MCP settings.", file=out)
     
-    print(f"\nNew Agent Configuration:")
-    print(f"  Name: {agent_name}")
-    print(f"  Model: {model}")
-    print(f"  Tools: {len(tools) if tools else 'unchanged'}")
+    print(f"\nNew Agent Configuration:", file=out)
+    print(f"  Name: {agent_name}", file=out)
+    print(f"  Model: {model}", file=out)
+    print(f"  Tools: {len(tools) if tools else 'unchanged'}", file=out)
     
     # Create new version
-    print("\nCreating new agent version...")
+    print("\nCreating new agent version...", file=out)
     try:
-        agent = project_client.agents.create_version(
+        agent = get_project_client().agents.create_version(
             agent_name=agent_name,
             definition=PromptAgentDefinition(
                 model=model,
@@ -276,20 +374,76 @@ def update_agent(
             description=description,
         )
         
-        print(f"\n✅ SUCCESS!")
-        print(f"   Agent Name: {agent.name}")
-        print(f"   New Version: {agent.version}")
-        print(f"   Agent ID: {agent.id}")
+        print(f"\n✅ SUCCESS!", file=out)
+        print(f"   Agent Name: {agent.name}", file=out)
+        print(f"   New Version: {agent.version}", file=out)
+        print(f"   Agent ID: {agent.id}", file=out)
         
-        print(f"\n📋 Next Steps:")
-        print(f"   1. Test the agent in Foundry Portal > Agent Builder")
-        print(f"   2. If published, click 'Publish Updates' to update the application")
+        print(f"\n📋 Next Steps:", file=out)
+        print(f"   1. Test the agent in Foundry Portal > Agent Builder", file=out)
+        print(f"   2. If published, click 'Publish Updates' to update the application", file=out)
         
         return agent
         
     except Exception as e:
-        print(f"\n❌ Error updating agent: {e}")
+        print(f"\n❌ Error updating agent: {e}", file=out)
+        return None
+
+
+def update_one(agent_name: str, out=None, **updates):
+    """
+    Fetch, display and update one agent.
+    
+    Args:
+        agent_name: Name of the agent to update
+        out: Stream for progress output (default: sys.stdout)
+        **updates: Keyword arguments for update_agent
+    
+    Returns:
+        The updated agent object, or None on failure
+    """
+    agent_info = get_agent_details(agent_name, out=out)
+    if not agent_info:
+        print(f"Error: Agent '{agent_name}' not found.", file=out)
         return None
+    
+    display_agent_config(agent_info, out=out)
+    return update_agent(agent_info=agent_info, out=out, **updates)
+
+
+def update_agents_concurrently(agent_names, **updates):
+    """
+    Update several agents at once, MAX_CONCURRENT_UPDATES at a time.
+    
+    Each update is independent (its own list_versions + create_version), so
+    they run on a thread pool sharing the one project client. Each agent
+    writes to its own buffer, which is printed as one block, in the order
+    the names were given. An exception in one update is reported as that
+    agent's failure and does not stop the others.
+    
+    Returns:
+        List of the agent names that could not be updated
+    """
+    # Connect before starting the threads so all of them share one client
+    get_project_client()
+    
+    outputs = {agent_name: io.StringIO() for agent_name in agent_names}
+    failed = []
+    with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_UPDATES, len(agent_names))) as executor:
+        futures = {
+            agent_name: executor.submit(update_one, agent_name, out=outputs[agent_name], **updates)
+            for agent_name in agent_names
+        }
+        for agent_name, future in futures.items():
+            try:
+                agent = future.result()
+            except Exception as e:
+                print(f"\n❌ Error updating agent '{agent_name}': {e}", file=outputs[agent_name])
+                agent = None
+            print(outputs[agent_name].getvalue(), end="")
+            if not agent:
+                failed.append(agent_name)
+    return failed
 
 
 # =============================================================================
@@ -393,8 +547,7 @@ def run_interactive():
         print("Instructions Update")
         print("-" * 70)
         print("Current instructions:")
-        current = agent_info.get('instructions', '')
-        print(f"  {current[:200]}..." if len(current) > 200 else f"  {current}")
+        print(f"  {truncate(agent_info.instructions, 200)}")
         print("\nEnter new instructions (or press Enter to keep current):")
         new_instructions = input().strip()
         if not new_instructions:
@@ -404,8 +557,7 @@ def run_interactive():
         print("\n" + "-" * 70)
         print("Description Update")
         print("-" * 70)
-        current_desc = agent_info.get('description', '')
-        print(f"Current description: {current_desc}")
+        print(f"Current description: {agent_info.description}")
         new_description = input("New description (or Enter to keep current): ").strip()
         if not new_description:
             new_description = None
@@ -420,7 +572,7 @@ def run_interactive():
         print(f"  ✓ MCP: {mcp_endpoint}")
         print(f"         require_approval: {MCP_REQUIRE_APPROVAL}")
     if new_instructions:
-        print(f"  ✓ Instructions: {new_instructions[:50]}...")
+        print(f"  ✓ Instructions: {truncate(new_instructions, 50)}")
     if new_description:
         print(f"  ✓ Description: {new_description}")
     
@@ -452,19 +604,12 @@ def run_interactive():
 def run_non_interactive(args):
     """Non-interactive mode for CI/CD pipelines."""
     
-    agent_name = args.name or AGENT_NAME
-    if not agent_name:
+    # Each name is fetched and updated once, even if it is repeated
+    agent_names = list(dict.fromkeys(args.name)) if args.name else ([AGENT_NAME] if AGENT_NAME else [])
+    if not agent_names:
         print("Error: Agent name required. Use --name or set AZURE_AI_FOUNDRY_AGENT_NAME")
         sys.exit(1)
     
-    # Get current agent info
-    agent_info = get_agent_details(agent_name)
-    if not agent_info:
-        print(f"Error: Agent '{agent_name}' not found.")
-        sys.exit(1)
-    
-    display_agent_config(agent_info)
-    
     # Determine what to update
     new_instructions = args.instructions if args.instructions else None
     new_description = args.description if args.description else None
@@ -475,9 +620,7 @@ def run_non_interactive(args):
         print("No updates specified. Use --update-mcp, --instructions, or --description")
         sys.exit(1)
     
-    # Apply update
-    agent = update_agent(
-        agent_info=agent_info,
+    updates = dict(
         new_instructions=new_instructions,
         new_description=new_description,
         update_mcp=update_mcp,
@@ -486,7 +629,16 @@ def run_non_interactive(args):
         mcp_server_label=MCP_SERVER_LABEL,
     )
     
-    if not agent:
+    # Apply update
+    if len(agent_names) == 1:
+        if not update_one(agent_names[0], **updates):
+            sys.exit(1)
+        return
+    
+    failed = update_agents_concurrently(agent_names, **updates)
+    print(f"\n{len(agent_names) - len(failed)}/{len(agent_names)} agent(s) updated")
+    if failed:
+        print(f"❌ Failed: {', '.join(failed)}")
         sys.exit(1)
 
 
@@ -511,6 +663,9 @@ Examples:
 
     # Update specific agent
     python ops/update-agent.py --non-interactive --name my-agent --update-mcp
+
+    # Update several agents concurrently
+    python ops/update-agent.py --non-interactive --name agent-a agent-b --update-mcp
         """
     )
     parser.add_argument(
@@ -520,7 +675,9 @@ Examples:
     )
     parser.add_argument(
         "--name",
-        help="Agent name (default: AZURE_AI_FOUNDRY_AGENT_NAME env var)"
+        nargs="+",
+        help="Agent name(s) (default: AZURE_AI_FOUNDRY_AGENT_NAME env var). "
+             "Several names are updated concurrently in non-interactive mode"
     )
     parser.add_argument(
         "--update-mcp",
@@ -21,20 +21,29 @@ Then open: http://localhost:8000
 import os
 import sys
 import json
+import time
 import asyncio
-import queue
-import threading
+import hashlib
+from contextlib import asynccontextmanager
+from functools import lru_cache
 from pathlib import Path
 from typing import AsyncGenerator
 
-from fastapi import FastAPI, Request
+import httpx
+
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, StreamingResponse
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
 from dotenv import load_dotenv
-from openai import OpenAI
-from azure.identity import DefaultAzureCredential, get_bearer_token_provider
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from azure.identity import DefaultAzureCredential
+
+# orjson is optional - serializes SSE frames faster than the json module
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Load environment variables from project root
 project_root = Path(__file__).resolve().parent.parent
@@ -51,13 +60,155 @@ if not APP_ENDPOINT:
     print("Set this in your .env file at the project root.")
     sys.exit(1)
 
+# =============================================================================
+# AZURE CLIENT
+# =============================================================================
+
+# One credential for the whole server (not one per request)
+credential = DefaultAzureCredential()
+TOKEN_SCOPE = "https://ai.azure.com/.default"
+
+# Refresh the cached token when it is this close to expiring
+TOKEN_REFRESH_MARGIN_SECONDS = 300
+
+# The background refresher renews the token this long before expiry, ahead
+# of the in-request check above, so requests normally never wait on Azure AD
+TOKEN_BACKGROUND_REFRESH_SECONDS = 600
+
+# Delay before retrying a failed background refresh
+TOKEN_RETRY_SECONDS = 30
+
+# Cached bearer token (shared by all requests until near expiry)
+_token_cache = {"token": None, "expires_on": 0}
+
+# Serializes token refreshes so concurrent requests wait for one refresh
+# instead of each starting their own
+_token_lock = asyncio.Lock()
+
+
+def get_token(force=False):
+    """Return a cached bearer token, acquiring a new one only when near expiry."""
+    if force or time.time() > _token_cache["expires_on"] - TOKEN_REFRESH_MARGIN_SECONDS:
+        access_token = credential.get_token(TOKEN_SCOPE)
+        _token_cache.update(token=access_token.token, expires_on=access_token.expires_on)
+    return _token_cache["token"]
+
+
+async def get_token_async(force=False):
+    """
+    Async form of get_token() for code running on the event loop.
+    
+    The credential call blocks (it may run Azure CLI or probe managed
+    identity), so a refresh runs in a worker thread behind _token_lock and
+    never stalls the open chat streams.
+    """
+    if force or time.time() > _token_cache["expires_on"] - TOKEN_REFRESH_MARGIN_SECONDS:
+        async with _token_lock:
+            # Re-check: another request may have refreshed while we waited
+            if force or time.time() > _token_cache["expires_on"] - TOKEN_REFRESH_MARGIN_SECONDS:
+                await asyncio.to_thread(get_token, True)
+    return _token_cache["token"]
+
+
+async def refresh_token_periodically():
+    """
+    Renew the cached token shortly before it expires, for the server's lifetime.
+    
+    Refreshes go through get_token_async, so they run in a worker thread
+    rather than on the event loop that serves the chat streams.
+    """
+    while True:
+        delay = _token_cache["expires_on"] - TOKEN_BACKGROUND_REFRESH_SECONDS - time.time()
+        await asyncio.sleep(max(delay, TOKEN_RETRY_SECONDS))
+        try:
+            await get_token_async(force=True)
+        except Exception as e:
+            print(f"Warning: token refresh failed, retrying in {TOKEN_RETRY_SECONDS}s: {e}")
+
+
+class CachedTokenAuth(httpx.Auth):
+    """
+    httpx auth hook that sets the cached bearer token on every request.
+    
+    The token is re-acquired only when it is close to expiry (see
+    get_token_async), so concurrent chats share one token instead of each
+    acquiring its own, and a refresh never blocks the event loop.
+    """
+    
+    async def async_auth_flow(self, request):
+        request.headers["Authorization"] = f"Bearer {await get_token_async()}"
+        yield request
+
+
+# Upstream connection pool shared by all chat streams. Sized for many
+# concurrent chats; with HTTP/2 (negotiated via ALPN, falls back to
+# HTTP/1.1) several streams can share one TLS connection to Foundry.
+UPSTREAM_MAX_CONNECTIONS = 100
+UPSTREAM_MAX_KEEPALIVE_CONNECTIONS = 50
+UPSTREAM_KEEPALIVE_EXPIRY_SECONDS = 120
+
+
+@lru_cache(maxsize=None)
+def get_async_openai_client() -> AsyncOpenAI:
+    """
+    Return the authenticated async OpenAI client for the Foundry endpoint.
+    
+    Built once and shared by every /chat stream, together with its connection
+    pool. The api_key is only a placeholder when no token has been acquired
+    yet; CachedTokenAuth sets the real Authorization header on every request.
+    """
+    return AsyncOpenAI(
+        api_key=_token_cache["token"] or "pending",
+        base_url=APP_ENDPOINT,
+        default_query={"api-version": "2025-11-15-preview"},
+        http_client=DefaultAsyncHttpxClient(
+            auth=CachedTokenAuth(),
+            transport=httpx.AsyncHTTPTransport(
+                http2=True,
+                retries=3,
+                limits=httpx.Limits(
+                    max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE_CONNECTIONS,
+                    max_connections=UPSTREAM_MAX_CONNECTIONS,
+                    keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY_SECONDS,
+                ),
+            ),
+        ),
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Warm the token, build the shared client and load index.html at startup,
+    then keep the token fresh in the background; on shutdown stop the
+    refresher and close the client's connections.
+    """
+    # Credential chain discovery happens here instead of on the first chat.
+    # A failure (e.g. no `az login` yet) must not stop the UI from being
+    # served: the first chat retries the token and reports the error, and
+    # the background refresher keeps retrying.
+    try:
+        await get_token_async()
+    except Exception as e:
+        print(f"Warning: could not acquire an Azure token at startup ({e})")
+        print("         Chats will retry; run 'az login' or check your credentials.")
+    client = get_async_openai_client()
+    refresher = asyncio.create_task(refresh_token_periodically())
+    index_html = (static_path / "index.html").read_bytes()
+    app.state.index_html = index_html
+    app.state.index_etag = f'"{hashlib.sha256(index_html).hexdigest()[:16]}"'
+    yield
+    refresher.cancel()
+    await client.close()
+
 # =============================================================================
 # FASTAPI APP
 # =============================================================================
 
 app = FastAPI(
     title="Foundry Agent Chat",
-    description="Web chat interface for Azure AI Foundry Published Agent"
+    description="Web chat interface for Azure AI Foundry Published Agent",
+    lifespan=lifespan,
 )
 
 # CORS for local development
@@ -74,253 +225,323 @@ static_path = Path(__file__).parent / "static"
 app.mount("/static", StaticFiles(directory=static_path), name="static")
 
 # =============================================================================
-# AZURE CLIENT
+# REQUEST VALIDATION
 # =============================================================================
 
-def get_openai_client() -> OpenAI:
-    """Create authenticated OpenAI client for Foundry endpoint."""
-    token_provider = get_bearer_token_provider(
-        DefaultAzureCredential(),
-        "https://ai.azure.com/.default"
-    )
+# Message roles accepted from the frontend
+CHAT_ROLES = frozenset({"user", "assistant", "system"})
+
+
+def parse_chat_messages(body: bytes) -> list[dict]:
+    """
+    Parse and validate a /chat request body.
     
-    return OpenAI(
-        api_key=token_provider(),
-        base_url=APP_ENDPOINT,
-        default_query={"api-version": "2025-11-15-preview"}
-    )
+    A light check in place of a pydantic model: the body must be
+    {"messages": [{"role": ..., "content": "..."}, ...]}.
+    
+    Args:
+        body: Raw request body
+    
+    Returns:
+        List of Responses API message input items, built in the same pass
+        as the validation so the history is copied only once
+    
+    Raises:
+        HTTPException: 400 for malformed JSON, 422 for an invalid shape
+    """
+    try:
+        data = orjson.loads(body) if orjson is not None else json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Request body is not valid JSON")
+    
+    messages = data.get("messages") if isinstance(data, dict) else None
+    if not isinstance(messages, list):
+        raise HTTPException(status_code=422, detail="'messages' must be a list")
+    
+    # Validate and build the input items in a single pass; only role and
+    # content are copied, so extra client-side keys never reach the API
+    input_items = []
+    for i, msg in enumerate(messages):
+        role, content = (msg.get("role"), msg.get("content")) if isinstance(msg, dict) else (None, None)
+        if role not in CHAT_ROLES or not isinstance(content, str):
+            raise HTTPException(
+                status_code=422,
+                detail=f"messages[{i}] must have a role in {sorted(CHAT_ROLES)} and string content",
+            )
+        input_items.append({"type": "message", "role": role, "content": content})
+    
+    return input_items
 
 # =============================================================================
-# MODELS
+# SSE STREAMING
 # =============================================================================
 
-class ChatMessage(BaseModel):
-    role: str
-    content: str
+# Prefix of a text_delta frame, pre-encoded so the hottest event path only
+# serializes the delta string itself
+_TEXT_DELTA_PREFIX = b'data: {"type":"text_delta","content":'
+
+
+# Frames whose payload never changes
+_SSE_DONE = b'data: {"type":"done"}\n\n'
+_SSE_DISCOVERY_DONE = b'data: {"type":"tool_discovery_done"}\n\n'
+
+
+def _dumps(obj) -> bytes:
+    """Serialize obj to compact JSON bytes (orjson when installed)."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def _sse(obj) -> bytes:
+    """Encode obj as one Server-Sent Events data frame."""
+    return b"data: " + _dumps(obj) + b"\n\n"
+
+
+# Text deltas are coalesced into one frame until this many characters are
+# pending or this much time has passed since the last text frame
+TEXT_FLUSH_CHARS = 64
+TEXT_FLUSH_SECONDS = 0.015
+
+
+def _text_delta_frame(delta: str) -> bytes:
+    """Encode a text_delta frame without building the event dict."""
+    return _TEXT_DELTA_PREFIX + _dumps(delta) + b"}\n\n"
 
-class ChatRequest(BaseModel):
-    messages: list[ChatMessage]
 
 # =============================================================================
-# SSE STREAMING
+# EVENT HANDLERS
 # =============================================================================
+# One handler per Responses API event type. Each handler is a generator that
+# yields the SSE frames for its event; `state` holds the per-stream
+# bookkeeping shared between handlers.
+
+def _on_item_added(event, state):
+    """New output item added: tool call starting or tool discovery."""
+    item = event.item
+    item_type = item.type
+    item_id = getattr(item, 'id', None)
+    
+    # MCP tool call starting
+    if item_type == "mcp_call":
+        tool_name = item.name or getattr(item, 'server_label', 'Tool')
+        state["tools"][item_id] = {'name': tool_name}
+        yield _sse({'type': 'tool_start', 'id': item_id, 'name': tool_name})
+    
+    # Tool discovery
+    elif item_type == "mcp_list_tools":
+        server_label = getattr(item, 'server_label', None) or 'knowledge base'
+        yield _sse({'type': 'tool_discovery', 'source': server_label})
+    
+    # Standard function call
+    elif item_type == "function_call":
+        func_name = item.name or 'Tool'
+        state["tools"][item_id] = {'name': func_name}
+        yield _sse({'type': 'tool_start', 'id': item_id, 'name': func_name})
+
 
-async def stream_agent_response(messages: list[dict]) -> AsyncGenerator[str, None]:
+def _on_mcp_args_done(event, state):
+    """
+    MCP arguments complete: send them for expandable display.
+    
+    The raw JSON string is forwarded as-is; the browser parses it for display.
+    """
+    item_id = event.item_id
+    arguments = event.arguments or '{}'
+    
+    if item_id and item_id in state["tools"]:
+        yield _sse({'type': 'tool_args', 'id': item_id, 'arguments': arguments})
+
+
+def _on_mcp_completed(event, state):
+    """MCP call completed."""
+    item_id = event.item_id
+    if item_id:
+        tool_info = state["tools"].pop(item_id, {})
+        yield _sse({'type': 'tool_done', 'id': item_id, 'name': tool_info.get('name', 'Tool')})
+
+
+def _on_list_tools_completed(event, state):
+    """Tool discovery completed."""
+    yield _SSE_DISCOVERY_DONE
+
+
+def _citation_frame(ann):
+    """
+    Build a citation frame for a url/file citation annotation, else None.
+    
+    Annotations on annotation.added events are plain dicts, while those on
+    finished message items are SDK objects, so both are accepted.
+    """
+    field = ann.get if isinstance(ann, dict) else (lambda name, default=None: getattr(ann, name, default))
+    ann_type = field("type")
+    if ann_type == "url_citation":
+        return _sse({'type': 'citation', 'citation': {'type': 'url', 'url': field("url")}})
+    if ann_type == "file_citation":
+        return _sse({'type': 'citation', 'citation': {'type': 'file', 'file_id': field("file_id", "unknown")}})
+    return None
+
+
+def _on_annotation_added(event, state):
+    """Citation added to the output text: send it as soon as it arrives."""
+    frame = _citation_frame(event.annotation)
+    if frame:
+        state["citations_streamed"] = True
+        yield frame
+
+
+def _on_item_done(event, state):
+    """Output item done: function call completion or message citations."""
+    item = event.item
+    item_type = item.type
+    
+    if item_type == "function_call":
+        item_id = item.id
+        yield _sse({'type': 'tool_args', 'id': item_id, 'arguments': item.arguments or '{}'})
+        yield _sse({'type': 'tool_done', 'id': item_id})
+        state["tools"].pop(item_id, None)
+    
+    # Citations not already streamed through annotation.added events
+    elif item_type == "message" and item.content and not state["citations_streamed"]:
+        last_content = item.content[-1]
+        if last_content.type == "output_text":
+            for ann in getattr(last_content, 'annotations', None) or []:
+                frame = _citation_frame(ann)
+                if frame:
+                    yield frame
+
+
+def _on_completed(event, state):
+    """Stream complete."""
+    yield _SSE_DONE
+
+
+def _on_error(event, state):
+    """Error reported by the service (ResponseErrorEvent: message, code, param)."""
+    message = event.message or 'Unknown error'
+    if event.code:
+        message = f"{message} ({event.code})"
+    yield _sse({'type': 'error', 'error': message})
+
+
+# Event type -> handler (text deltas are handled inline in the stream loop)
+EVENT_HANDLERS = {
+    "response.output_item.added": _on_item_added,
+    "response.mcp_call_arguments.done": _on_mcp_args_done,
+    "response.mcp_call.completed": _on_mcp_completed,
+    "response.mcp_list_tools.completed": _on_list_tools_completed,
+    "response.output_text.annotation.added": _on_annotation_added,
+    "response.output_item.done": _on_item_done,
+    "response.completed": _on_completed,
+    "error": _on_error,
+}
+
+
+async def stream_agent_response(input_items: list[dict]) -> AsyncGenerator[bytes, None]:
     """
     Stream the agent response as Server-Sent Events.
     
+    input_items are the message items from parse_chat_messages(), passed
+    to the Responses API as-is.
+    
     Event types sent to frontend:
         - text_delta: Streaming text content
         - tool_start: Tool call started (name, id)
-        - tool_args: Tool arguments (for expandable display)
+        - tool_args: Tool arguments as a raw JSON string (for expandable display)
         - tool_done: Tool call completed
         - tool_discovery: Tool discovery phase
+        - citation: One source citation (url or file)
         - done: Stream complete
         - error: Error occurred
     """
     try:
-        client = get_openai_client()
-        
-        # Build input items from messages
-        input_items = [
-            {"type": "message", "role": msg["role"], "content": msg["content"]}
-            for msg in messages
-        ]
-        
-        # Run the synchronous OpenAI stream in a thread to avoid blocking
-        # This allows SSE events to flush immediately
-        event_queue = queue.Queue()
-        stream_done = False
+        client = get_async_openai_client()
         
-        def stream_to_queue():
-            nonlocal stream_done
-            try:
-                stream = client.responses.create(
-                    stream=True,
-                    input=input_items,
-                )
-                for event in stream:
-                    event_queue.put(event)
-                event_queue.put(None)  # Signal completion
-            except Exception as e:
-                event_queue.put(e)
-            finally:
-                stream_done = True
+        # Tool calls by ID, and whether any citation arrived through an
+        # annotation.added event
+        state = {"tools": {}, "citations_streamed": False}
+        pending_text = []   # Text deltas not yet sent
+        pending_chars = 0
+        last_flush = time.monotonic()
         
-        # Start streaming in background thread
-        stream_thread = threading.Thread(target=stream_to_queue, daemon=True)
-        stream_thread.start()
-        
-        pending_tools = {}  # Track tool calls by ID
-        pending_args = {}   # Track streaming arguments
-        
-        # Process events from queue with async yielding
-        while True:
-            try:
-                # Non-blocking get with small timeout
-                event = event_queue.get(timeout=0.05)
-                
-                if event is None:
-                    break  # Stream complete
-                
-                if isinstance(event, Exception):
-                    raise event
-                    
-                event_type = getattr(event, 'type', None)
+        # Native async stream: each event is forwarded as soon as it arrives,
+        # with no worker thread, queue or polling in between
+        stream = await client.responses.create(
+            stream=True,
+            input=input_items,
+        )
+        async with stream:
+            async for event in stream:
+                event_type = event.type
                 
-                # Text streaming
+                # Text streaming: coalesce small deltas into fewer frames
                 if event_type == "response.output_text.delta":
-                    delta = getattr(event, 'delta', '')
-                    yield f"data: {json.dumps({'type': 'text_delta', 'content': delta})}\n\n"
-                    await asyncio.sleep(0)  # Force flush
-                
-                # New output item added
-                elif event_type == "response.output_item.added":
-                    item = getattr(event, 'item', None)
-                    if item:
-                        item_type = getattr(item, 'type', None)
-                        item_id = getattr(item, 'id', None)
-                        
-                        # MCP tool call starting
-                        if item_type == "mcp_call":
-                            tool_name = getattr(item, 'name', None) or getattr(item, 'server_label', 'Tool')
-                            pending_tools[item_id] = {'name': tool_name, 'arguments': ''}
-                            yield f"data: {json.dumps({'type': 'tool_start', 'id': item_id, 'name': tool_name})}\n\n"
-                            await asyncio.sleep(0)  # Force flush
-                        
-                        # Tool discovery
-                        elif item_type == "mcp_list_tools":
-                            server_label = getattr(item, 'server_label', 'knowledge base')
-                            yield f"data: {json.dumps({'type': 'tool_discovery', 'source': server_label})}\n\n"
-                            await asyncio.sleep(0)  # Force flush
-                        
-                        # Standard function call
-                        elif item_type == "function_call":
-                            func_name = getattr(item, 'name', 'Tool')
-                            pending_tools[item_id] = {'name': func_name, 'arguments': ''}
-                            yield f"data: {json.dumps({'type': 'tool_start', 'id': item_id, 'name': func_name})}\n\n"
-                            await asyncio.sleep(0)  # Force flush
-                
-                # MCP call in progress
-                elif event_type == "response.mcp_call.in_progress":
-                    item_id = getattr(event, 'item_id', None)
-                    if item_id and item_id not in pending_args:
-                        pending_args[item_id] = ""
-                
-                # MCP arguments streaming
-                elif event_type == "response.mcp_call_arguments.delta":
-                    item_id = getattr(event, 'item_id', None)
-                    delta = getattr(event, 'delta', '')
-                    if item_id:
-                        if item_id not in pending_args:
-                            pending_args[item_id] = ""
-                        pending_args[item_id] += delta
-                
-                # MCP arguments complete
-                elif event_type == "response.mcp_call_arguments.done":
-                    item_id = getattr(event, 'item_id', None)
-                    arguments = getattr(event, 'arguments', '{}')
-                    
-                    if item_id and item_id in pending_tools:
-                        pending_tools[item_id]['arguments'] = arguments
-                        # Send arguments for expandable display
-                        try:
-                            args_parsed = json.loads(arguments) if arguments else {}
-                            yield f"data: {json.dumps({'type': 'tool_args', 'id': item_id, 'arguments': args_parsed})}\n\n"
-                        except:
-                            yield f"data: {json.dumps({'type': 'tool_args', 'id': item_id, 'arguments': arguments})}\n\n"
-                        await asyncio.sleep(0)  # Force flush
+                    pending_text.append(event.delta)
+                    pending_chars += len(event.delta)
+                    now = time.monotonic()
+                    if pending_chars >= TEXT_FLUSH_CHARS or now - last_flush >= TEXT_FLUSH_SECONDS:
+                        yield _text_delta_frame("".join(pending_text))
+                        pending_text.clear()
+                        pending_chars = 0
+                        last_flush = now
+                    continue
                 
-                # MCP call completed
-                elif event_type == "response.mcp_call.completed":
-                    item_id = getattr(event, 'item_id', None)
-                    if item_id:
-                        tool_info = pending_tools.get(item_id, {})
-                        yield f"data: {json.dumps({'type': 'tool_done', 'id': item_id, 'name': tool_info.get('name', 'Tool')})}\n\n"
-                        await asyncio.sleep(0)  # Force flush
-                        pending_tools.pop(item_id, None)
-                        pending_args.pop(item_id, None)
+                # Any other event: send buffered text first, so trailing text
+                # never waits for a later event and ordering is kept
+                if pending_text:
+                    yield _text_delta_frame("".join(pending_text))
+                    pending_text.clear()
+                    pending_chars = 0
+                    last_flush = time.monotonic()
                 
-                # Tool discovery completed
-                elif event_type == "response.mcp_list_tools.completed":
-                    yield f"data: {json.dumps({'type': 'tool_discovery_done'})}\n\n"
-                    await asyncio.sleep(0)  # Force flush
+                handler = EVENT_HANDLERS.get(event_type)
+                if handler is None:
+                    continue
                 
-                # Output item done - check for function_call completion
-                elif event_type == "response.output_item.done":
-                    item = getattr(event, 'item', None)
-                    if item:
-                        item_type = getattr(item, 'type', None)
-                        item_id = getattr(item, 'id', None)
-                        
-                        if item_type == "function_call":
-                            func_args = getattr(item, 'arguments', '{}')
-                            try:
-                                args_parsed = json.loads(func_args) if func_args else {}
-                                yield f"data: {json.dumps({'type': 'tool_args', 'id': item_id, 'arguments': args_parsed})}\n\n"
-                            except:
-                                pass
-                            yield f"data: {json.dumps({'type': 'tool_done', 'id': item_id})}\n\n"
-                            await asyncio.sleep(0)  # Force flush
-                            pending_tools.pop(item_id, None)
-                        
-                        # Check for citations
-                        elif item_type == "message":
-                            content = getattr(item, 'content', [])
-                            if content and len(content) > 0:
-                                last_content = content[-1]
-                                if getattr(last_content, 'type', None) == "output_text":
-                                    annotations = getattr(last_content, 'annotations', [])
-                                    citations = []
-                                    for ann in annotations:
-                                        if getattr(ann, 'type', None) == "url_citation":
-                                            citations.append({'type': 'url', 'url': ann.url})
-                                        elif getattr(ann, 'type', None) == "file_citation":
-                                            citations.append({'type': 'file', 'file_id': getattr(ann, 'file_id', 'unknown')})
-                                    if citations:
-                                        yield f"data: {json.dumps({'type': 'citations', 'citations': citations})}\n\n"
-                                        await asyncio.sleep(0)  # Force flush
-                
-                # Stream complete
-                elif event_type == "response.completed":
-                    yield f"data: {json.dumps({'type': 'done'})}\n\n"
-                
-                # Error
-                elif event_type == "error":
-                    error = getattr(event, 'error', 'Unknown error')
-                    yield f"data: {json.dumps({'type': 'error', 'error': str(error)})}\n\n"
-                    
-            except queue.Empty:
-                # No event yet, yield control to event loop
-                await asyncio.sleep(0.01)
-                continue
+                for frame in handler(event, state):
+                    yield frame
+            
+            # Stream ended without a further event
+            if pending_text:
+                yield _text_delta_frame("".join(pending_text))
         
     except Exception as e:
-        yield f"data: {json.dumps({'type': 'error', 'error': str(e)})}\n\n"
+        yield _sse({'type': 'error', 'error': str(e)})
 
 # =============================================================================
 # ROUTES
 # =============================================================================
 
+# Browsers may reuse the chat page for this long before revalidating
+INDEX_CACHE_CONTROL = "public, max-age=300"
+
+
 @app.get("/", response_class=HTMLResponse)
-async def root():
-    """Serve the main chat interface."""
-    index_path = static_path / "index.html"
-    return HTMLResponse(content=index_path.read_text(), status_code=200)
+async def root(request: Request):
+    """
+    Serve the main chat interface.
+    
+    index.html is read once at startup (restart the server after editing it)
+    and served with an ETag, so reloads are answered with 304 Not Modified.
+    """
+    headers = {"ETag": app.state.index_etag, "Cache-Control": INDEX_CACHE_CONTROL}
+    if request.headers.get("if-none-match") == app.state.index_etag:
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(content=app.state.index_html, status_code=200, headers=headers)
 
 
 @app.post("/chat")
-async def chat(request: ChatRequest):
+async def chat(request: Request):
     """
     Stream chat response via Server-Sent Events.
     
     The frontend sends the full conversation history,
     and we stream back events for text, tool calls, etc.
     """
-    messages = [{"role": m.role, "content": m.content} for m in request.messages]
+    input_items = parse_chat_messages(await request.body())
     
     return StreamingResponse(
-        stream_agent_response(messages),
+        stream_agent_response(input_items),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
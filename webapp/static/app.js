@@ -398,6 +398,7 @@ function completeDiscovery(messageElements) {
 
 /**
  * Update tool card with arguments
+ * (the server sends the raw JSON string; pretty-print it when it parses)
  */
 function updateToolArguments(toolId, args) {
     const tool = state.currentTools[toolId];
@@ -405,6 +406,13 @@ function updateToolArguments(toolId, args) {
     
     const argsEl = tool.element.querySelector('.tool-arguments pre');
     if (argsEl) {
+        if (typeof args === 'string') {
+            try {
+                args = JSON.parse(args);
+            } catch (e) {
+                // Not valid JSON - show it verbatim
+            }
+        }
         const formatted = typeof args === 'object' 
             ? JSON.stringify(args, null, 2) 
             : String(args);
@@ -448,38 +456,40 @@ window.toggleToolCard = toggleToolCard;
 // =============================================================================
 
 /**
- * Add citations to the message
+ * Add one citation to the message
+ * (the Sources list is created on the first citation; later ones are appended)
  */
-function addCitations(messageElements, citations) {
-    if (!citations || citations.length === 0) return;
-    
-    let citationsHtml = `
-        <div class="citations">
-            <div class="citations-header">
-                ${icons.citation}
-                <span>Sources</span>
-            </div>
-            <ul class="citation-list">
-    `;
-    
-    citations.forEach((citation, index) => {
-        if (citation.type === 'url') {
-            citationsHtml += `
-                <li class="citation-item">
-                    <a href="${escapeHtml(citation.url)}" target="_blank" rel="noopener">
-                        ${escapeHtml(citation.url)}
-                    </a>
-                </li>
-            `;
-        } else if (citation.type === 'file') {
-            citationsHtml += `
-                <li class="citation-item">📄 ${escapeHtml(citation.file_id)}</li>
-            `;
-        }
-    });
+function addCitation(messageElements, citation) {
+    let item;
+    if (citation.type === 'url') {
+        item = `
+            <li class="citation-item">
+                <a href="${escapeHtml(citation.url)}" target="_blank" rel="noopener">
+                    ${escapeHtml(citation.url)}
+                </a>
+            </li>
+        `;
+    } else if (citation.type === 'file') {
+        item = `
+            <li class="citation-item">📄 ${escapeHtml(citation.file_id)}</li>
+        `;
+    } else {
+        return;
+    }
     
-    citationsHtml += '</ul></div>';
-    messageElements.citations.innerHTML = citationsHtml;
+    if (!messageElements.citationList) {
+        messageElements.citations.innerHTML = `
+            <div class="citations">
+                <div class="citations-header">
+                    ${icons.citation}
+                    <span>Sources</span>
+                </div>
+                <ul class="citation-list"></ul>
+            </div>
+        `;
+        messageElements.citationList = messageElements.citations.querySelector('.citation-list');
+    }
+    messageElements.citationList.insertAdjacentHTML('beforeend', item);
 }
 
 // =============================================================================
@@ -606,8 +616,9 @@ function handleSSEEvent(data, messageElements, onText) {
             completeDiscovery(messageElements);
             break;
             
-        case 'citations':
-            addCitations(messageElements, data.citations);
+        case 'citation':
+            // Citations arrive one at a time; append each to the list
+            addCitation(messageElements, data.citation);
             break;
             
         case 'error':